@@ -0,0 +1,40 @@
+"""
+Benchmark of the relevance stage of :func:`pyLDAvis.prepare` for increasing `n_jobs`.
+
+The workers read the log probabilities and lifts from one shared memory-mapped copy,
+so the time should go down with the number of cores instead of being dominated by
+sending the topic-term matrices to every worker.
+
+Usage: python benchmarks/relevance_n_jobs.py [n_topics] [n_terms]
+"""
+import sys
+import time
+
+import numpy as np
+from joblib import cpu_count
+
+from pyLDAvis import PreparedModel
+
+
+def main(n_topics=200, n_terms=100000):
+    rng = np.random.RandomState(0)
+    topic_term_dists = rng.dirichlet(np.full(n_terms, 0.05), size=n_topics)
+    topic_freq = rng.randint(1000, 100000, size=n_topics).astype(float)
+    term_frequency = topic_term_dists.T.dot(topic_freq)
+    vocab = np.array(['term%d' % i for i in range(n_terms)], dtype=object)
+
+    print('%d topics, %d terms, %d cores' % (n_topics, n_terms, cpu_count()))
+    n_jobs = 1
+    while n_jobs <= cpu_count():
+        model = PreparedModel(topic_term_dists, None, None, vocab, term_frequency,
+                              n_jobs=n_jobs, topic_freq=topic_freq, validate='none')
+        # the log probabilities and lifts are computed beforehand, as they do not depend on n_jobs
+        model.saliency
+        start = time.perf_counter()
+        model.relevant_terms(30, 0.01)
+        print('n_jobs=%-3d %.2fs' % (n_jobs, time.perf_counter() - start))
+        n_jobs *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -20,6 +20,12 @@ Functions: General Use
 :func:`save_json`
     save the visualization JSON data of to a file
 
+:class:`TopicDistances`
+    distances between the topics of a model, reusable across calls to :func:`prepare`
+
+:class:`PreparedModel`
+    the statistics of a model, from which it is prepared again for new display parameters
+
 
 Functions: IPython Notebook
 ---------------------------
@@ -35,11 +41,11 @@ Functions: IPython Notebook
 
 __all__ = ["__version__",
            "prepare", "js_PCoA",
-           "PreparedData", "prepared_data_to_html",
+           "PreparedData", "PreparedModel", "TopicDistances", "prepared_data_to_html",
            "display", "show", "save_html", "save_json",
            "enable_notebook", "disable_notebook"]
 
 __version__ = "3.4.1"
 
 from pyLDAvis._display import *
-from pyLDAvis._prepare import prepare, js_PCoA, PreparedData
+from pyLDAvis._prepare import prepare, js_PCoA, PreparedData, PreparedModel, TopicDistances
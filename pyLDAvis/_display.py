@@ -3,11 +3,13 @@
 # It was adapted for pyLDAvis by Ben Mabey
 import warnings
 import random
+import base64
+import gzip
 import json
 import jinja2
 import re
 from pyLDAvis._server import serve
-from pyLDAvis.utils import get_id, write_ipynb_local_js, NumPyEncoder
+from pyLDAvis.utils import get_id, write_ipynb_local_js
 from pyLDAvis._prepare import PreparedData
 import pyLDAvis.urls as urls
 
@@ -111,8 +113,46 @@ TEMPLATE_DICT = {"simple": SIMPLE_HTML,
                  "general": GENERAL_HTML}
 
 
+# Expression replacing the data in the templates when it is compressed: a promise of
+# the data, decompressed by the browser, or in JavaScript where it cannot. The text is
+# evaluated like the data embedded uncompressed, since JSON.parse rejects the NaN and
+# Infinity values it may contain.
+GZIP_JSON = jinja2.Template("""(function(data){
+    {{ gunzip | indent(4) }}
+    function evaluate(text){ return new Function("return " + text)(); }
+    var bytes = Uint8Array.from(atob(data), function(c){ return c.charCodeAt(0); });
+    if(typeof(DecompressionStream) === "undefined"){
+        return Promise.resolve(evaluate(new TextDecoder().decode(LDAvis_gunzip(bytes))));
+    }
+    var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+    return new Response(stream).text().then(evaluate);
+}({{ data }}))""")
+
+
+def _inline_js_url(filename):
+    """A data URL embedding the JavaScript file in the page."""
+    with open(filename, 'rb') as f:
+        return 'data:text/javascript;base64,' + base64.b64encode(f.read()).decode('ascii')
+
+
+def _vis_json(data, binary=False, compress=None):
+    """The data of the visualization as a JavaScript expression."""
+    vis_json = data.to_json(binary=binary)
+    if compress is None:
+        return vis_json
+    if compress != 'gzip':
+        raise ValueError("compress must be None or 'gzip', not %r" % (compress,))
+    # fixed mtime, so that the same data gives the same HTML
+    compressed = gzip.compress(vis_json.encode('utf-8'), compresslevel=6, mtime=0)
+    with open(urls.GUNZIP_LOCAL, 'r') as f:
+        gunzip = f.read().strip()
+    return GZIP_JSON.render(data=json.dumps(base64.b64encode(compressed).decode('ascii')),
+                            gunzip=gunzip)
+
+
 def prepared_data_to_html(data, d3_url=None, ldavis_url=None, ldavis_css_url=None,
-                          template_type="general", visid=None, use_http=False):
+                          template_type="general", visid=None, use_http=False, binary=False,
+                          compress=None):
     """Output HTML with embedded visualization
 
     Parameters
@@ -141,6 +181,20 @@ def prepared_data_to_html(data, d3_url=None, ldavis_url=None, ldavis_css_url=Non
         If not specified, a random id will be generated.
     use_http : boolean (optional)
         If true, use http:// instead of https:// for d3_url and ldavis_url.
+    binary : boolean (optional)
+        If true, embed the data as typed arrays with a single vocabulary (see
+        :meth:`PreparedData.to_dict`), which is much smaller and faster to load
+        for large models. It needs an LDAvis library that decodes it, such as
+        ``js/ldavis.v3.1.0.js``: without an `ldavis_url`, the page embeds the local
+        copy of the library.
+    compress : None or 'gzip' (optional)
+        If 'gzip', embed the data gzip-compressed and base64-encoded, usually
+        several times smaller. The browser decompresses it with
+        ``DecompressionStream``, or more slowly with the JavaScript of
+        ``js/gunzip.js``, embedded in the page, where it is not available. If
+        None (the default), embed plain JSON. Like `binary`, it needs an LDAvis
+        library that reads it, so without an `ldavis_url` the page embeds the local
+        copy of the library.
 
     Returns
     -------
@@ -158,6 +212,11 @@ def prepared_data_to_html(data, d3_url=None, ldavis_url=None, ldavis_css_url=Non
     template = TEMPLATE_DICT[template_type]
 
     d3_url = d3_url or urls.D3_URL
+    if ldavis_url is None and (binary or compress):
+        # the library at the default URL is the one released with this version, which
+        # may predate the decoding of binary and compressed data, so the page embeds the
+        # local one
+        ldavis_url = _inline_js_url(urls.LDAVIS_LOCAL)
     ldavis_url = ldavis_url or urls.LDAVIS_URL
     ldavis_css_url = ldavis_css_url or urls.LDAVIS_CSS_URL
 
@@ -174,7 +233,7 @@ def prepared_data_to_html(data, d3_url=None, ldavis_url=None, ldavis_css_url=Non
                            visid_raw=visid,
                            d3_url=d3_url,
                            ldavis_url=ldavis_url,
-                           vis_json=data.to_json(),
+                           vis_json=_vis_json(data, binary, compress),
                            ldavis_css_url=ldavis_css_url)
 
 
@@ -338,7 +397,8 @@ def save_html(data, fileobj, **kwargs):
         The filename or file-like object in which to write the HTML
         representation of the visualization.
     **kwargs :
-        additional keyword arguments will be passed to :func:`prepared_data_to_html`
+        additional keyword arguments will be passed to :func:`prepared_data_to_html`,
+        e.g. ``compress='gzip'`` to embed the data compressed
 
     See Also
     --------
@@ -381,4 +441,4 @@ def save_json(data, fileobj):
             fileobj = open(fileobj, 'w')
     if not hasattr(fileobj, 'write'):
         raise ValueError("fileobj should be a filename or a writable file")
-    json.dump(data.to_dict(), fileobj, cls=NumPyEncoder)
+    fileobj.writelines(data._json_pieces())
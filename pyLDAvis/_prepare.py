@@ -3,45 +3,64 @@ pyLDAvis Prepare
 ===============
 Main transformation functions for preparing LDAdata to the visualization's data structures
 """
+import base64
+import hashlib
 import json
 import logging
+import os
+import tempfile
+import zipfile
 import numpy as np
 import pandas as pd
 from collections import namedtuple
-from joblib import Parallel, delayed, cpu_count
+from concurrent.futures import ThreadPoolExecutor
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.linalg import eigh
+from scipy.sparse import csr_matrix, issparse
+from scipy.sparse.linalg import eigsh
+from scipy.special import xlogy
 from scipy.stats import entropy
-from scipy.spatial.distance import pdist, squareform
+from scipy.spatial.distance import squareform
 from sklearn.manifold import MDS, TSNE
 
 from pyLDAvis.utils import NumPyEncoder
 
 
-def __num_dist_rows__(array, ndigits=2):
-    return array.shape[0] - int((pd.DataFrame(array).sum(axis=1) < 0.999).sum())
+# number of rows summed at a time when validating distributions
+_VALIDATION_CHUNK_SIZE = 2 ** 16
+# number of rows checked per matrix, or batch of documents, with validate='sample'
+_VALIDATION_SAMPLE_SIZE = 1000
+
+
+def _num_invalid_rows(array, tol=1e-3, sample=False):
+    """Counts the rows of a (possibly sparse) matrix that sum to less than `1 - tol`.
+
+    The rows are summed in chunks, without copying the matrix. With `sample`,
+    only a fixed random subset of at most `_VALIDATION_SAMPLE_SIZE` rows is checked.
+    """
+    n_rows = array.shape[0]
+    if sample and n_rows > _VALIDATION_SAMPLE_SIZE:
+        rows = np.random.RandomState(0).choice(n_rows, _VALIDATION_SAMPLE_SIZE, replace=False)
+        array = array[np.sort(rows)]
+        n_rows = _VALIDATION_SAMPLE_SIZE
+    n_invalid = 0
+    for start in range(0, n_rows, _VALIDATION_CHUNK_SIZE):
+        sums = np.asarray(array[start:start + _VALIDATION_CHUNK_SIZE].sum(axis=1)).ravel()
+        n_invalid += int(np.count_nonzero(sums < 1 - tol))
+    return n_invalid
 
 
 class ValidationError(ValueError):
     pass
 
 
-def _input_check(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequency):
+def _input_check(topic_term_dists, vocab, term_frequency, validate='full', tol=1e-3):
     ttds = topic_term_dists.shape
-    dtds = doc_topic_dists.shape
     errors = []
 
     def err(msg):
         errors.append(msg)
 
-    if dtds[1] != ttds[0]:
-        err_msg = ('Number of rows of topic_term_dists does not match number of columns of '
-                   'doc_topic_dists; both should be equal to the number of topics in the model.')
-        err(err_msg)
-
-    if len(doc_lengths) != dtds[0]:
-        err_msg = ('Length of doc_lengths not equal to the number of rows in doc_topic_dists;'
-                   'both should be equal to the number of documents in the data.')
-        err(err_msg)
-
     W = len(vocab)
     if ttds[1] != W:
         err_msg = ('Number of terms in vocabulary does not match the number of columns of '
@@ -53,27 +72,251 @@ def _input_check(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_fre
                    'number of terms in the vocabulary (len of vocab)')
         err(err_msg)
 
-    if __num_dist_rows__(topic_term_dists) != ttds[0]:
+    if (validate != 'none'
+            and _num_invalid_rows(topic_term_dists, tol, sample=validate == 'sample')):
         err('Not all rows (distributions) in topic_term_dists sum to 1.')
 
-    if __num_dist_rows__(doc_topic_dists) != dtds[0]:
-        err('Not all rows (distributions) in doc_topic_dists sum to 1.')
-
     if len(errors) > 0:
         return errors
 
 
-def _input_validate(*args):
-    res = _input_check(*args)
+def _input_validate(topic_term_dists, vocab, term_frequency, doc_errors=(), validate='full',
+                    tol=1e-3):
+    res = _input_check(topic_term_dists, vocab, term_frequency, validate, tol) or []
+    res += list(doc_errors)
     if res:
         raise ValidationError('\n' + '\n'.join([' * ' + s for s in res]))
 
 
+# number of documents read at a time when doc_topic_dists is given as a single matrix
+_DOC_CHUNK_SIZE = 2 ** 16
+
+
+def _doc_batches(doc_topic_dists, doc_lengths, chunk_size=_DOC_CHUNK_SIZE):
+    """Yields `(doc_topic_dists, doc_lengths)` batches of at most `chunk_size` documents.
+
+    When `doc_lengths` is None, `doc_topic_dists` already is an iterable of batches.
+    Slicing a memory-mapped array (or a list) only reads the documents of each batch.
+    """
+    if doc_lengths is None:
+        for batch in doc_topic_dists:
+            if not (isinstance(batch, (tuple, list)) and len(batch) == 2
+                    and np.ndim(batch[0]) == 2):
+                raise ValidationError(
+                    'doc_lengths is None, so doc_topic_dists should be an iterable of '
+                    '(doc_topic_dists, doc_lengths) batches, got %s instead. Pass '
+                    'doc_lengths with a single document-topic matrix.' % type(batch).__name__)
+            yield batch
+        return
+    n_docs = doc_topic_dists.shape[0] if issparse(doc_topic_dists) else len(doc_topic_dists)
+    for start in range(0, n_docs, chunk_size):
+        yield (doc_topic_dists[start:start + chunk_size],
+               doc_lengths[start:start + chunk_size])
+
+
+def _topic_frequency(doc_topic_dists, doc_lengths, n_topics, validate='full', tol=1e-3):
+    """Accumulates the number of tokens of each topic over batches of documents.
+
+    The documents are validated in the same single pass, so that the whole
+    document-topic matrix never needs to be in memory. See :func:`prepare` for
+    `validate` and `tol`.
+
+    Returns
+    -------
+    topic_freq : array, shape `n_topics`
+    errors : list of str
+        The validation errors found in the documents.
+    """
+    errors = []
+    if doc_lengths is not None:
+        n_docs = doc_topic_dists.shape[0] if issparse(doc_topic_dists) else len(doc_topic_dists)
+        if len(doc_lengths) != n_docs:
+            errors.append('Length of doc_lengths not equal to the number of rows in '
+                          'doc_topic_dists;both should be equal to the number of documents '
+                          'in the data.')
+            return None, errors
+
+    topic_freq = np.zeros(n_topics)
+    n_invalid_rows = 0
+    for dists, lengths in _doc_batches(doc_topic_dists, doc_lengths):
+        if not issparse(dists):
+            dists = np.asarray(dists)
+        lengths = np.asarray(lengths)
+        if dists.ndim != 2 or dists.shape[1] != n_topics:
+            errors.append('Number of rows of topic_term_dists does not match number of '
+                          'columns of doc_topic_dists; both should be equal to the number of '
+                          'topics in the model.')
+            break
+        if len(lengths) != dists.shape[0]:
+            errors.append('Length of doc_lengths not equal to the number of rows in '
+                          'doc_topic_dists;both should be equal to the number of documents '
+                          'in the data.')
+            break
+        topic_freq += np.asarray(dists.T.dot(lengths)).ravel()
+        if validate != 'none':
+            n_invalid_rows += _num_invalid_rows(dists, tol, sample=validate == 'sample')
+
+    if n_invalid_rows:
+        errors.append('Not all rows (distributions) in doc_topic_dists sum to 1.')
+    return topic_freq, errors
+
+
 def _jensen_shannon(_P, _Q):
     _M = 0.5 * (_P + _Q)
     return 0.5 * (entropy(_P, _M) + entropy(_Q, _M))
 
 
+# upper bound on the number of elements in the blocks of topic pairs used to compute
+# the Jensen-Shannon divergences between topics
+_JS_BLOCK_SIZE = 2 ** 22
+
+
+def _float_dtype(array):
+    """The dtype of `array` if it is floating point, float64 otherwise."""
+    return array.dtype if array.dtype.kind == 'f' else np.dtype(np.float64)
+
+
+def _normalized(distributions):
+    if issparse(distributions):
+        distributions = csr_matrix(distributions, dtype=_float_dtype(distributions))
+        row_sums = np.asarray(distributions.sum(axis=1)).ravel()
+        return csr_matrix(distributions.multiply(1 / row_sums[:, None]), dtype=distributions.dtype)
+    distributions = np.asarray(distributions)
+    distributions = np.asarray(distributions, dtype=_float_dtype(distributions))
+    return distributions / distributions.sum(axis=1, keepdims=True, dtype=distributions.dtype)
+
+
+def _sum_xlogx(distributions):
+    """sum(P log P) for every row P of `distributions`, skipping zeros."""
+    if issparse(distributions):
+        xlogx = distributions.copy()
+        xlogx.data = xlogy(xlogx.data, xlogx.data)
+        return np.asarray(xlogx.sum(axis=1)).ravel()
+    return xlogy(distributions, distributions).sum(axis=1)
+
+
+def _mixture_xlogx(distributions, rows, cols):
+    """sum(M log M) for the mixtures M = (P + Q) / 2 of the pairs (`rows[i]`, `cols[i]`)
+    of rows of the dense or sparse `distributions`, computed for blocks of pairs.
+    """
+    sums = np.empty(len(rows), dtype=distributions.dtype)
+    block = max(1, _JS_BLOCK_SIZE // distributions.shape[1])
+    for i in range(0, len(rows), block):
+        P, Q = rows[i:i + block], cols[i:i + block]
+        sums[i:i + block] = _sum_xlogx(0.5 * (distributions[P] + distributions[Q]))
+    return sums
+
+
+def _js_divergences(neg_entropy, mixture_xlogx, rows, cols):
+    """Uses JS(P, Q) = (sum(P log P) + sum(Q log Q)) / 2 - sum(M log M), where `neg_entropy`
+    holds sum(P log P) for every row and `mixture_xlogx` sum(M log M) for every pair.
+    """
+    dists = 0.5 * (neg_entropy[rows] + neg_entropy[cols]) - mixture_xlogx
+    # rounding can leave identical distributions slightly apart in either direction
+    return np.maximum(dists, 0, out=dists)
+
+
+def _jensen_shannon_pairs(distributions, neg_entropy, rows, cols):
+    """Jensen-Shannon divergences between the pairs (`rows[i]`, `cols[i]`) of rows of the
+    normalized, dense or sparse, `distributions`, whose sum(P log P) are `neg_entropy`.
+    """
+    return _js_divergences(neg_entropy, _mixture_xlogx(distributions, rows, cols), rows, cols)
+
+
+def _chunk_bounds(n_items, n_jobs):
+    """The (start, stop) bounds of one chunk of `n_items` per worker, for `n_jobs` workers
+    (following the joblib conventions). There are fewer chunks than workers rather than
+    empty chunks when there are fewer items.
+    """
+    n_chunks = max(1, min(effective_n_jobs(n_jobs), n_items))
+    bounds = np.linspace(0, n_items, n_chunks + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _pairs_mixture_xlogx(distributions, rows, cols, executor=None, n_workers=1):
+    """:func:`_mixture_xlogx`, with the pairs split into `n_workers` tasks for the `executor`."""
+    if executor is None:
+        return _mixture_xlogx(distributions, rows, cols)
+    tasks = [(distributions, rows[start:stop], cols[start:stop])
+             for start, stop in _chunk_bounds(len(rows), n_workers)]
+    return np.concatenate(_map_tasks(_mixture_xlogx, tasks, executor=executor))
+
+
+def _jensen_shannon_pdist(distributions, executor=None, term_block_size=None, n_jobs=-1):
+    """Jensen-Shannon divergences between all pairs of rows of `distributions`, as a
+    condensed distance matrix.
+
+    Equivalent to `pdist(distributions, metric=_jensen_shannon)`, without calling back
+    into Python for every pair. With an `executor`, the pairs are split into `n_jobs` tasks.
+    With a `term_block_size`, a dense `distributions` is normalized and read for blocks of
+    that many terms (columns) at a time, adding up the sums over the terms, instead of
+    making full-size copies of it.
+    """
+    rows, cols = np.triu_indices(distributions.shape[0], k=1)
+    n_workers = effective_n_jobs(n_jobs)
+    if term_block_size is None or issparse(distributions):
+        distributions = _normalized(distributions)
+        neg_entropy = _sum_xlogx(distributions)
+        mixture_xlogx = _pairs_mixture_xlogx(distributions, rows, cols, executor, n_workers)
+        return _js_divergences(neg_entropy, mixture_xlogx, rows, cols)
+    distributions = np.asarray(distributions)
+    dtype = _float_dtype(distributions)
+    row_sums = distributions.sum(axis=1, keepdims=True, dtype=dtype)
+    neg_entropy = np.zeros(len(distributions), dtype=dtype)
+    mixture_xlogx = np.zeros(len(rows), dtype=dtype)
+    for start in range(0, distributions.shape[1], term_block_size):
+        block = distributions[:, start:start + term_block_size] / row_sums
+        neg_entropy += _sum_xlogx(block)
+        mixture_xlogx += _pairs_mixture_xlogx(block, rows, cols, executor, n_workers)
+    return _js_divergences(neg_entropy, mixture_xlogx, rows, cols)
+
+
+class TopicDistances:
+    """Jensen-Shannon divergences between the topics of a model, stored as a condensed
+    distance matrix (see `scipy.spatial.distance.squareform`).
+
+    Computing the divergences is the most expensive part of the topic layout, so they can
+    be computed once with :meth:`from_distributions` and passed to :func:`prepare` (or
+    straight to :func:`js_PCoA`, :func:`js_MMDS` and :func:`js_TSNE`) as many times as needed.
+    """
+
+    def __init__(self, condensed):
+        self.condensed = np.asarray(condensed)
+        self.n_topics = int(round((1 + np.sqrt(1 + 8 * len(self.condensed))) / 2))
+
+    @classmethod
+    def from_distributions(cls, topic_term_dists, dtype=None, executor=None,
+                           term_block_size=None, n_jobs=-1):
+        """Divergences between the rows of `topic_term_dists`, stored with the given `dtype`.
+        By default, float32 distributions give float32 distances and anything else float64.
+        The divergences are computed by the `concurrent.futures.Executor` if one is given,
+        split into `n_jobs` tasks (one per CPU by default), and for blocks of
+        `term_block_size` terms at a time if given.
+        """
+        condensed = _jensen_shannon_pdist(topic_term_dists, executor, term_block_size, n_jobs)
+        return cls(condensed if dtype is None else condensed.astype(dtype, copy=False))
+
+    def square(self):
+        """The full `n_topics` by `n_topics` distance matrix."""
+        return squareform(self.condensed, checks=False)
+
+    def take(self, indices):
+        """Distances between the topics at `indices`, in that order."""
+        indices = np.asarray(indices)
+        return TopicDistances(squareform(self.square()[np.ix_(indices, indices)], checks=False))
+
+
+def _topic_distances(distributions):
+    if isinstance(distributions, TopicDistances):
+        return distributions
+    return TopicDistances.from_distributions(distributions)
+
+
+# above this many topics, PCoA finds the leading eigenpairs by Lanczos iteration
+# rather than with a dense eigensolver
+_PCOA_LANCZOS_MIN_TOPICS = 500
+
+
 def _pcoa(pair_dists, n_components=2):
     """Principal Coordinate Analysis,
     aka Classical Multidimensional Scaling
@@ -81,18 +324,26 @@ def _pcoa(pair_dists, n_components=2):
     # code referenced from skbio.stats.ordination.pcoa
     # https://github.com/biocore/scikit-bio/blob/0.5.0/skbio/stats/ordination/_principal_coordinate_analysis.py
 
-    # pairwise distance matrix is assumed symmetric
-    pair_dists = np.asarray(pair_dists, np.float64)
-
-    # perform SVD on double centred distance matrix
-    n = pair_dists.shape[0]
-    H = np.eye(n) - np.ones((n, n)) / n
-    B = - H.dot(pair_dists ** 2).dot(H) / 2
-    eigvals, eigvecs = np.linalg.eig(B)
-
-    # Take first n_components of eigenvalues and eigenvectors
+    # pairwise distance matrix is assumed symmetric, so its row and column means are equal.
+    # double centre the squared distances in place: B = -(I - 1/n) D^2 (I - 1/n) / 2
+    B = np.array(pair_dists)
+    B = B.astype(_float_dtype(B), copy=False)
+    B **= 2
+    means = B.mean(axis=1)
+    B -= means[:, None]
+    B -= means[None, :]
+    B += means.mean()
+    B *= -0.5
+
+    # only the eigenpairs with the n_components largest eigenvalues are needed
+    n = B.shape[0]
+    if n > _PCOA_LANCZOS_MIN_TOPICS:
+        eigvals, eigvecs = eigsh(B, k=n_components, which='LA',
+                                 v0=np.random.RandomState(0).rand(n))
+    else:
+        eigvals, eigvecs = eigh(B, subset_by_index=[max(n - n_components, 0), n - 1])
     # sorted in decreasing order
-    ix = eigvals.argsort()[::-1][:n_components]
+    ix = eigvals.argsort()[::-1]
     eigvals = eigvals[ix]
     eigvecs = eigvecs[:, ix]
 
@@ -113,15 +364,14 @@ def js_PCoA(distributions):
 
     Parameters
     ----------
-    distributions : array-like, shape (`n_dists`, `k`)
-        Matrix of distributions probabilities.
+    distributions : array-like, shape (`n_dists`, `k`), or TopicDistances
+        Matrix of distributions probabilities, or the precomputed distances between them.
 
     Returns
     -------
     pcoa : array, shape (`n_dists`, 2)
     """
-    dist_matrix = squareform(pdist(distributions, metric=_jensen_shannon))
-    return _pcoa(dist_matrix)
+    return _pcoa(_topic_distances(distributions).square())
 
 
 def js_MMDS(distributions, **kwargs):
@@ -129,8 +379,8 @@ def js_MMDS(distributions, **kwargs):
 
     Parameters
     ----------
-    distributions : array-like, shape (`n_dists`, `k`)
-        Matrix of distributions probabilities.
+    distributions : array-like, shape (`n_dists`, `k`), or TopicDistances
+        Matrix of distributions probabilities, or the precomputed distances between them.
 
     **kwargs : Keyword argument to be passed to `sklearn.manifold.MDS()`
 
@@ -138,7 +388,7 @@ def js_MMDS(distributions, **kwargs):
     -------
     mmds : array, shape (`n_dists`, 2)
     """
-    dist_matrix = squareform(pdist(distributions, metric=_jensen_shannon))
+    dist_matrix = _topic_distances(distributions).square()
     model = MDS(n_components=2, random_state=0, dissimilarity='precomputed', **kwargs)
     return model.fit_transform(dist_matrix)
 
@@ -148,8 +398,8 @@ def js_TSNE(distributions, **kwargs):
 
     Parameters
     ----------
-    distributions : array-like, shape (`n_dists`, `k`)
-        Matrix of distributions probabilities.
+    distributions : array-like, shape (`n_dists`, `k`), or TopicDistances
+        Matrix of distributions probabilities, or the precomputed distances between them.
 
     **kwargs : Keyword argument to be passed to `sklearn.manifold.TSNE()`
 
@@ -157,168 +407,1244 @@ def js_TSNE(distributions, **kwargs):
     -------
     tsne : array, shape (`n_dists`, 2)
     """
-    dist_matrix = squareform(pdist(distributions, metric=_jensen_shannon))
+    dist_matrix = _topic_distances(distributions).square()
     model = TSNE(n_components=2, random_state=0, metric='precomputed', init='random',
                  perplexity=min(len(dist_matrix) - 1, 30), **kwargs)
     return model.fit_transform(dist_matrix)
 
 
-def _df_with_names(data, index_name, columns_name):
-    if type(data) == pd.DataFrame:
-        # we want our index to be numbered
-        df = pd.DataFrame(data.values)
-    else:
-        df = pd.DataFrame(data)
-    df.index.name = index_name
-    df.columns.name = columns_name
-    return df
-
+def _landmark_distances(distributions, n_landmarks):
+    """Picks `n_landmarks` topics by farthest-point sampling, starting from the first topic,
+    and returns their indices along with their distances to every topic.
+    """
+    if isinstance(distributions, TopicDistances):
+        square = distributions.square()
+        K, dtype = len(square), square.dtype
 
-def _series_with_name(data, name):
-    if type(data) == pd.Series:
-        data.name = name
-        # ensures a numeric index
-        return data.reset_index()[name]
+        def distances_to(k):
+            return square[k]
     else:
-        return pd.Series(data, name=name)
+        distributions = _normalized(distributions)
+        neg_entropy = _sum_xlogx(distributions)
+        K, dtype = distributions.shape[0], distributions.dtype
+
+        def distances_to(k):
+            return _jensen_shannon_pairs(distributions, neg_entropy, np.full(K, k), np.arange(K))
+
+    n_landmarks = min(n_landmarks, K)
+    landmarks = np.zeros(n_landmarks, dtype=np.intp)
+    dists = np.empty((n_landmarks, K), dtype=dtype)
+    nearest = np.full(K, np.inf)
+    for i in range(n_landmarks):
+        if i > 0:
+            landmarks[i] = nearest.argmax()
+        dists[i] = distances_to(landmarks[i])
+        np.minimum(nearest, dists[i], out=nearest)
+    return landmarks, dists
+
+
+def js_LMDS(distributions, n_landmarks=200):
+    """Dimension reduction via Jensen-Shannon Divergence & Landmark Multidimensional Scaling
+
+    Classical scaling is applied to a sample of landmark topics only, and every topic is
+    then placed by triangulation from its distances to the landmarks (de Silva, V. and
+    Tenenbaum, J. B. (2004): Sparse multidimensional scaling using landmark points).
+    Only `n_landmarks` by `n_dists` distances are computed, so time and memory grow
+    linearly with the number of topics. With at least as many landmarks as topics
+    this is the same as :func:`js_PCoA`.
+
+    Parameters
+    ----------
+    distributions : array-like, shape (`n_dists`, `k`), or TopicDistances
+        Matrix of distributions probabilities, or the precomputed distances between them.
 
+    n_landmarks : int
+        Number of landmark topics. Default is 200.
 
-def _topic_coordinates(mds, topic_term_dists, topic_proportion, start_index=1):
-    K = topic_term_dists.shape[0]
-    mds_res = mds(topic_term_dists)
+    Returns
+    -------
+    lmds : array, shape (`n_dists`, 2)
+    """
+    landmarks, dists = _landmark_distances(distributions, n_landmarks)
+    landmark_coords = _pcoa(dists[:, landmarks])
+    # the pseudo-inverse of the landmark coordinates, whose columns are sqrt(eigval) * eigvec
+    eigvals = (landmark_coords ** 2).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pinv = np.where(eigvals > 0, landmark_coords / eigvals, 0)
+    sq_dists = dists ** 2
+    mean_sq_dists = sq_dists[:, landmarks].mean(axis=1)
+    return -0.5 * (sq_dists - mean_sq_dists[:, None]).T.dot(pinv)
+
+
+def _topic_coordinates(mds, topic_term_dists, topic_proportion, topic_order, start_index=1,
+                       topic_distances=None):
+    K = len(topic_order)
+    if topic_distances is None:
+        mds_res = mds(topic_term_dists[topic_order])
+    else:
+        mds_res = mds(topic_distances.take(topic_order))
     assert mds_res.shape == (K, 2)
+    mds_res = np.asarray(mds_res, dtype=np.float64)
     mds_df = pd.DataFrame({'x': mds_res[:, 0], 'y': mds_res[:, 1],
                            'topics': range(start_index, K + start_index),
-                           'cluster': 1, 'Freq': topic_proportion * 100})
+                           'cluster': 1, 'Freq': topic_proportion * 100},
+                          index=pd.Index(topic_order, name='topic'))
     # note: cluster (should?) be deprecated soon. See: https://github.com/cpsievert/LDAvis/issues/26
     return mds_df
 
 
-def _chunks(lambda_seq, n):
-    """ Yield successive n-sized chunks from lambda_seq.
+def _map_tasks(func, tasks, n_workers=1, executor=None):
+    """Results of `func(*task)` for every task, computed by the `executor` when given,
+    otherwise by `n_workers` joblib workers, or in-process for a single worker.
     """
-    for i in range(0, len(lambda_seq), n):
-        yield lambda_seq[i:i + n]
+    if executor is not None:
+        return list(executor.map(func, *zip(*tasks))) if tasks else []
+    if n_workers == 1:
+        return [func(*task) for task in tasks]
+    return Parallel(n_jobs=n_workers)(delayed(func)(*task) for task in tasks)
 
 
-def _job_chunks(lambda_seq, n_jobs):
-    n_chunks = n_jobs
-    if n_jobs < 0:
-        # so, have n chunks if we are using all n cores/cpus
-        n_chunks = cpu_count() + 1 - n_jobs
+# below this number of relevance values, the relevance is computed in-process since
+# starting the workers would take longer than the computation itself
+_PARALLEL_MIN_VALUES = 2 ** 26
 
-    return _chunks(lambda_seq, n_chunks)
 
+def _relevance_schedule(n_topics, n_terms, n_lambdas, n_jobs):
+    """Splits the relevance computation into one task per worker.
 
-def _find_relevance(log_ttd, log_lift, R, lambda_):
-    relevance = lambda_ * log_ttd + (1 - lambda_) * log_lift
-    return relevance.T.apply(lambda topic: topic.nlargest(R).index)
+    The topics are split first, since a worker then only reads the log probabilities
+    and lifts of its own topics; the lambdas are also split when there are fewer
+    topics than workers. A single task is returned when the problem is too small
+    for parallelism to pay off.
 
+    Returns
+    -------
+    n_workers : int
+    tasks : list of (slice, slice)
+        The topics and lambdas of each task.
+    """
+    n_workers = effective_n_jobs(n_jobs)
+    if n_workers <= 1 or n_topics * n_terms * n_lambdas < _PARALLEL_MIN_VALUES:
+        return 1, [(slice(0, n_topics), slice(0, n_lambdas))]
+    n_topic_chunks = min(n_topics, n_workers)
+    n_lambda_chunks = min(n_lambdas, -(-n_workers // n_topic_chunks))
+    topic_bounds = np.linspace(0, n_topics, n_topic_chunks + 1).astype(int)
+    lambda_bounds = np.linspace(0, n_lambdas, n_lambda_chunks + 1).astype(int)
+    tasks = [(slice(k0, k1), slice(l0, l1))
+             for k0, k1 in zip(topic_bounds[:-1], topic_bounds[1:])
+             for l0, l1 in zip(lambda_bounds[:-1], lambda_bounds[1:])]
+    return min(n_workers, len(tasks)), tasks
+
+
+def _shared_arrays(folder, *arrays):
+    """Saves the arrays in `folder` and returns their file names.
+
+    Worker processes memory-map the files read-only, so they all read the same
+    pages instead of unpickling their own copy of the arrays.
+    """
+    filenames = []
+    for i, array in enumerate(arrays):
+        filename = os.path.join(folder, 'array%d.npy' % i)
+        np.save(filename, array)
+        filenames.append(filename)
+    return filenames
 
-def _find_relevance_chunks(log_ttd, log_lift, R, lambda_seq):
-    return pd.concat([_find_relevance(log_ttd, log_lift, R, seq) for seq in lambda_seq])
 
+# upper bound on the number of relevance values held in memory at once while
+# searching for the top terms of a block of (lambda, topic) pairs
+_RELEVANCE_BLOCK_SIZE = 2 ** 22
 
-def _topic_info(topic_term_dists, topic_proportion, term_frequency, term_topic_freq,
-                vocab, lambda_step, R, n_jobs, start_index=1):
-    # marginal distribution over terms (width of blue bars)
-    term_proportion = term_frequency / term_frequency.sum()
 
-    # compute the distinctiveness and saliency of the terms:
-    # this determines the R terms that are displayed when no topic is selected.
-    # TODO(msusol): Make flake8 test pass here with 'unused' variables.
-    tt_sum = topic_term_dists.sum()
-    topic_given_term = pd.eval("topic_term_dists / tt_sum")
-    log_1 = np.log(pd.eval("topic_given_term.T / topic_proportion"))
-    kernel = pd.eval("topic_given_term * log_1.T")
-    distinctiveness = kernel.sum()
-    saliency = term_proportion * distinctiveness
-    # Order the terms for the "default" view by decreasing saliency:
-    default_term_info = pd.DataFrame({
-        'saliency': saliency,
-        'Term': vocab,
-        'Freq': term_frequency,
-        'Total': term_frequency,
-        'Category': 'Default'})
-    default_term_info = default_term_info.sort_values(
-        by='saliency', ascending=False).head(R).drop('saliency', axis=1)
+def _top_terms(relevance, R):
+    """Column indices of the `R` largest values in each row of `relevance`, ordered by
+    decreasing value. Like `pd.Series.nlargest`, ties are broken by the lowest index.
+    """
+    relevance[np.isnan(relevance)] = -np.inf
+    n_terms = relevance.shape[1]
+    top = np.argpartition(relevance, n_terms - R, axis=1)[:, n_terms - R:]
+    top_values = np.take_along_axis(relevance, top, axis=1)
+    cutoff = top_values.min(axis=1)[:, None]
+    # argpartition picks arbitrarily among the terms tied at the cutoff, so redo those rows
+    n_tied = (relevance == cutoff).sum(axis=1)
+    for i in np.flatnonzero(n_tied != (top_values == cutoff).sum(axis=1)):
+        above = np.flatnonzero(relevance[i] > cutoff[i])
+        tied = np.flatnonzero(relevance[i] == cutoff[i])[:R - len(above)]
+        top[i] = np.concatenate([above, tied])
+        top_values[i] = relevance[i, top[i]]
+    order = np.lexsort((top, -top_values), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _find_relevance(log_ttd, log_lift, R, lambda_seq):
+    """Indices of the `R` most relevant terms for every (lambda, topic) pair.
+
+    Relevance is computed for blocks of lambdas and topics at a time, so that at most
+    `_RELEVANCE_BLOCK_SIZE` values are held in memory.
+
+    Returns
+    -------
+    top_terms : array, shape (`len(lambda_seq)`, `n_topics`, `R`)
+    """
+    lambda_seq = np.asarray(lambda_seq, dtype=log_ttd.dtype)[:, None, None]
+    K, W = log_ttd.shape
+    topic_block = max(1, min(K, _RELEVANCE_BLOCK_SIZE // W))
+    lambda_block = max(1, _RELEVANCE_BLOCK_SIZE // (topic_block * W))
+    top_terms = np.empty((len(lambda_seq), K, R), dtype=np.intp)
+    for k in range(0, K, topic_block):
+        ttd = log_ttd[k:k + topic_block]
+        lift = log_lift[k:k + topic_block]
+        for j in range(0, len(lambda_seq), lambda_block):
+            lambda_ = lambda_seq[j:j + lambda_block]
+            with np.errstate(invalid='ignore'):
+                relevance = lambda_ * ttd + (1 - lambda_) * lift
+            top_terms[j:j + lambda_block, k:k + topic_block] = _top_terms(
+                relevance.reshape(-1, W), R).reshape(len(lambda_), -1, R)
+    return top_terms
+
+
+def _find_shared_relevance(filenames, topics, R, lambda_seq):
+    """:func:`_find_relevance` for the `topics` of the log probabilities and lifts saved
+    by :func:`_shared_arrays`.
+    """
+    log_ttd, log_lift = (np.load(filename, mmap_mode='r')[topics] for filename in filenames)
+    return _find_relevance(log_ttd, log_lift, R, lambda_seq)
+
+
+# lambdas at which the candidates for the exact relevance mode are bounded
+_EXACT_LAMBDA_GRID = np.linspace(0, 1, 11)
+# step taken past each crossing point by the exact relevance sweep
+_EXACT_LAMBDA_TOL = 1e-9
+# lambda increment used by the visualization's slider when relevance is computed exactly
+_EXACT_SLIDER_STEP = 0.01
+
+
+# margin, in units of the float precision times the largest finite log value, by which
+# a term must lie below the relevance envelope to be ruled out, to allow for rounding
+_CANDIDATE_SLACK = 64
+
+
+def _relevance_candidates(log_ttd, log_lift, R, grid=_EXACT_LAMBDA_GRID):
+    """Boolean mask of the terms that can be among the `R` most relevant terms of a topic
+    for some lambda between the first and last values of the increasing `grid`.
+
+    Relevance is linear in lambda, so for the `R` terms `S` that are most relevant at a grid
+    point, the `R`-th best relevance on a neighbouring interval is at least the lower envelope
+    of the lines of `S`. A term lying strictly below that envelope at both ends of the
+    interval lies below it on the whole interval, because the difference is convex; if that
+    holds on every interval the term can never make the top `R`.
+    """
+    grid = np.asarray(grid, dtype=log_ttd.dtype)[:, None, None]
+    K, W = log_ttd.shape
+    topic_block = max(1, min(K, _RELEVANCE_BLOCK_SIZE // (len(grid) * W)))
+    candidates = np.zeros((K, W), dtype=bool)
+    for k in range(0, K, topic_block):
+        ttd, lift = log_ttd[k:k + topic_block], log_lift[k:k + topic_block]
+        with np.errstate(invalid='ignore'):
+            relevance = grid * ttd + (1 - grid) * lift
+        scale = max(np.max(np.abs(ttd), where=np.isfinite(ttd), initial=0),
+                    np.max(np.abs(lift), where=np.isfinite(lift), initial=0))
+        slack = _CANDIDATE_SLACK * np.finfo(log_ttd.dtype).eps * scale
+        top = _top_terms(relevance.reshape(-1, W), R).reshape(len(grid), -1, R)
+        top_relevance = np.take_along_axis(relevance, top, axis=2)
+        cutoff = top_relevance[:, :, -1:] - slack
+        # envelopes of the top terms of each grid point, evaluated at the next/previous point
+        next_cutoff = np.take_along_axis(relevance[1:], top[:-1], axis=2).min(axis=2)[..., None]
+        prev_cutoff = np.take_along_axis(relevance[:-1], top[1:], axis=2).min(axis=2)[..., None]
+        next_cutoff -= slack
+        prev_cutoff -= slack
+        candidates[k:k + topic_block] = _above_envelopes(relevance, cutoff, next_cutoff,
+                                                         prev_cutoff)
+    return candidates
+
+
+def _above_envelopes(relevance, cutoff, next_cutoff, prev_cutoff):
+    """Whether each term does not lie below the envelopes on every grid interval, given
+    its `relevance` at the grid points, shape (`n_grid`, `n_topics`, `n_terms`), the
+    relevance of the `R`-th top term at each point and the envelopes of the top terms of
+    each point at the next and previous ones. See :func:`_relevance_candidates`.
+    """
+    left, right = relevance[:-1], relevance[1:]
+    below = (((left < cutoff[:-1]) & (right < next_cutoff)) |
+             ((left < prev_cutoff) & (right < cutoff[1:])))
+    return ~below.all(axis=0)
+
+
+def _prune_terms(log_ttd, log_lift, R, lambda_max=1.):
+    """Indices of the terms that can be among the `R` most relevant terms of some topic
+    for a lambda in [0, `lambda_max`].
+
+    The other terms are safely left out of the search over a grid of lambdas, which then
+    only runs on the (usually few) remaining ones. See :func:`_relevance_candidates`.
+    """
+    grid = np.linspace(0, lambda_max, len(_EXACT_LAMBDA_GRID))
+    terms = np.flatnonzero(_relevance_candidates(log_ttd, log_lift, R, grid).any(axis=0))
+    logging.info('Pruned %d of %d terms that cannot be among the %d most relevant terms '
+                 'of any topic' % (log_ttd.shape[1] - len(terms), log_ttd.shape[1], R))
+    return terms
+
+
+def _exact_top_terms(log_ttd, log_lift, R):
+    """Every term that is among the `R` most relevant terms of a topic for some lambda in
+    [0, 1], in order of first appearance as lambda increases.
+
+    Sweeps lambda from 0 to 1, jumping straight to the next point where a term outside the
+    current top `R` overtakes one inside it. Terms that only lead on intervals narrower than
+    `_EXACT_LAMBDA_TOL` are ignored.
+    """
+    # stepping past the crossing points needs double precision
+    log_ttd, log_lift = log_ttd.astype(np.float64), log_lift.astype(np.float64)
+    ix = np.arange(len(log_ttd))
+    slope = log_ttd - log_lift
+    # the ends of the lambda range rank ties like the grid search does
+    terms = [np.lexsort((ix, -log_lift))[:R]]
+    lambda_ = 0.
+    while True:
+        relevance = log_lift + lambda_ * slope
+        top = np.lexsort((ix, -slope, -relevance))[:R]
+        terms.append(top)
+        inside = np.zeros(len(ix), dtype=bool)
+        inside[top] = True
+        gap = relevance[inside][:, None] - relevance[~inside]
+        closing = slope[~inside] - slope[inside][:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = np.where(closing > 0, gap / closing, np.inf)
+        if crossing.size == 0:
+            break
+        lambda_ += crossing.min() + _EXACT_LAMBDA_TOL
+        if lambda_ > 1:
+            break
+    terms.append(np.lexsort((ix, -log_ttd))[:R])
+    return np.concatenate(terms)
+
+
+def _find_exact_relevance(log_ttd, log_lift, R):
+    """(topic, term) index pairs of the terms each topic shows for some lambda in [0, 1]."""
+    candidates = _relevance_candidates(log_ttd, log_lift, R)
+    topic_ix, term_ix = [], []
+    for k in range(len(log_ttd)):
+        terms = np.flatnonzero(candidates[k] & np.isfinite(log_ttd[k]) & np.isfinite(log_lift[k]))
+        top = terms[_exact_top_terms(log_ttd[k, terms], log_lift[k, terms], min(R, len(terms)))]
+        topic_ix.append(np.full(len(top), k))
+        term_ix.append(top)
+    return np.concatenate(topic_ix), np.concatenate(term_ix)
+
+
+def _find_sparse_relevance(topic_term_dists, term_proportion, R, lambda_step, epsilon):
+    """(topic, term) index pairs of the most relevant terms of each topic of a sparse
+    `topic_term_dists`, with their log probabilities and log lifts.
+
+    Zero probabilities are smoothed to `epsilon`. Among the terms a topic does not use,
+    relevance then only depends on the term proportion, so apart from the topic's nonzero
+    terms only its `R` rarest unused terms are candidates. Memory therefore scales with
+    the number of nonzeros rather than with the size of the matrix.
+    """
+    if lambda_step != 'exact':
+        lambda_seq = np.arange(0, 1 + lambda_step, lambda_step)
+    rarest = np.argsort(term_proportion, kind='stable')
+    # terms that no topic uses have no defined lift
+    rarest = rarest[term_proportion[rarest] > 0]
+    topic_ix, term_ix, logprob, loglift = [], [], [], []
+    for k in range(topic_term_dists.shape[0]):
+        row = topic_term_dists[k]
+        unused = rarest[:R + row.nnz]
+        unused = unused[~np.isin(unused, row.indices)][:R]
+        terms = np.concatenate([row.indices, unused])
+        probs = np.concatenate([row.data, np.full(len(unused), epsilon)])
+        # relevance ties are broken by the lowest term index
+        order = terms.argsort()
+        terms, probs = terms[order], probs[order]
+        log_ttd = np.log(probs)[None]
+        log_lift = np.log(probs / term_proportion[terms])[None]
+        if lambda_step == 'exact':
+            _, top = _find_exact_relevance(log_ttd, log_lift, min(R, len(terms)))
+        else:
+            top = _find_relevance(log_ttd, log_lift, min(R, len(terms)), lambda_seq).ravel()
+        _, top = _unique_topic_terms(np.zeros_like(top), top, len(terms))
+        topic_ix.append(np.full(len(top), k))
+        term_ix.append(terms[top])
+        logprob.append(log_ttd[0, top])
+        loglift.append(log_lift[0, top])
+    return tuple(map(np.concatenate, (topic_ix, term_ix, logprob, loglift)))
+
+
+# upper bound on the number of elements in the blocks of terms over which the log
+# probabilities, log lifts and saliency of a dense topic-term matrix are computed
+_TERM_BLOCK_SIZE = 2 ** 20
+
+
+def _term_statistics(topic_term_dists, topic_proportion, term_proportion, log_dists=True):
+    """Log probabilities, log lifts and saliency of the terms of a dense `topic_term_dists`,
+    computed in a single pass over blocks of terms.
+
+    The saliency of a term is its proportion times its distinctiveness, the KL divergence
+    between the topic distribution given the term and the marginal topic distribution.
+    Only the log probabilities and lifts are allocated in full; the intermediate values
+    are written into buffers of one block of terms, reused for every block. With
+    `log_dists` False, only the saliency is computed.
+
+    Returns
+    -------
+    log_ttd, log_lift : array, shape (`n_topics`, `n_terms`), or None
+    saliency : array, shape `n_terms`
+    """
+    K, W = topic_term_dists.shape
+    block = max(1, min(W, _TERM_BLOCK_SIZE // K))
+    log_ttd = log_lift = None
+    if log_dists:
+        log_ttd = np.empty_like(topic_term_dists)
+        log_lift = np.empty_like(topic_term_dists)
+    distinctiveness = np.empty(W)
+    topic_given_term = np.empty((K, block), dtype=topic_term_dists.dtype)
+    kernel = np.empty((K, block), dtype=np.result_type(topic_term_dists, topic_proportion))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, W, block):
+            stop = min(start + block, W)
+            dists = topic_term_dists[:, start:stop]
+            if log_dists:
+                np.log(dists, out=log_ttd[:, start:stop])
+                lift = log_lift[:, start:stop]
+                np.divide(dists, term_proportion[start:stop], out=lift)
+                np.log(lift, out=lift)
+            given_term = topic_given_term[:, :stop - start]
+            np.divide(dists, dists.sum(axis=0), out=given_term)
+            kern = kernel[:, :stop - start]
+            np.divide(given_term, topic_proportion[:, None], out=kern)
+            np.log(kern, out=kern)
+            kern *= given_term
+            distinctiveness[start:stop] = np.nansum(kern, axis=0)
+    return log_ttd, log_lift, term_proportion * distinctiveness
+
+
+def _sparse_saliency(topic_term_dists, topic_proportion, term_proportion):
+    """Saliency of every term, from the nonzero entries of a sparse `topic_term_dists`."""
+    entries = topic_term_dists.tocoo()
+    term_sums = np.bincount(entries.col, weights=entries.data, minlength=entries.shape[1])
+    topic_given_term = entries.data / term_sums[entries.col]
+    kernel = topic_given_term * np.log(topic_given_term / topic_proportion[entries.row])
+    distinctiveness = np.bincount(entries.col, weights=kernel, minlength=entries.shape[1])
+    return term_proportion * distinctiveness
+
+
+def _unique_topic_terms(topic_ix, term_ix, n_terms):
+    """Drop repeated (topic, term) pairs, keeping the first appearance of each."""
+    _, first = np.unique(topic_ix * n_terms + term_ix, return_index=True)
+    first.sort()
+    return topic_ix[first], term_ix[first]
+
+
+def _relevant_terms(topic_term_dists, log_ttd, log_lift, term_proportion, lambda_step, R,
+                    n_jobs=-1, sparse_epsilon=1e-12, executor=None):
+    """The most relevant terms of every topic, over all the values of lambda.
+
+    `log_ttd` and `log_lift` are the log probabilities and lifts of a dense
+    `topic_term_dists`, and are not used for a sparse one.
+
+    Returns
+    -------
+    topic_ix, term_ix, logprob, loglift : arrays
+        The (topic, term) pairs, grouped by topic in the original topic order and in order
+        of first appearance within a topic, with their log probabilities and log lifts.
+    """
+    K, W = topic_term_dists.shape
+    if issparse(topic_term_dists):
+        return _find_sparse_relevance(topic_term_dists, term_proportion, R, lambda_step,
+                                      sparse_epsilon)
+    if lambda_step == 'exact':
+        topic_ix, term_ix = _find_exact_relevance(log_ttd, log_lift, R)
+    else:
+        lambda_seq = np.arange(0, 1 + lambda_step, lambda_step)
+        search_ttd, search_lift, terms = log_ttd, log_lift, None
+        # bounding the relevance on a coarse grid first is cheaper than searching a fine one
+        if len(lambda_seq) > len(_EXACT_LAMBDA_GRID):
+            kept = _prune_terms(log_ttd, log_lift, R, lambda_seq[-1])
+            if len(kept) < W:
+                terms = kept
+                search_ttd, search_lift = log_ttd[:, terms], log_lift[:, terms]
+        n_workers, tasks = _relevance_schedule(K, search_ttd.shape[1], len(lambda_seq), n_jobs)
+        if n_workers == 1:
+            top_terms = _find_relevance(search_ttd, search_lift, R, lambda_seq)
+        else:
+            top_terms = np.empty((len(lambda_seq), K, R), dtype=np.intp)
+            if isinstance(executor, ThreadPoolExecutor):
+                results = _map_tasks(_find_relevance,
+                                     [(search_ttd[ks], search_lift[ks], R, lambda_seq[ls])
+                                      for ks, ls in tasks], executor=executor)
+            else:
+                with tempfile.TemporaryDirectory(prefix='pyLDAvis_') as folder:
+                    # the workers share one on-disk copy of the log probabilities and lifts
+                    filenames = _shared_arrays(folder, search_ttd, search_lift)
+                    results = _map_tasks(_find_shared_relevance,
+                                         [(filenames, ks, R, lambda_seq[ls])
+                                          for ks, ls in tasks], n_workers, executor)
+            for (ks, ls), result in zip(tasks, results):
+                top_terms[ls, ks] = result
+        topic_ix = np.repeat(np.arange(K), top_terms.shape[0] * R)
+        term_ix = top_terms.transpose(1, 0, 2).ravel()
+        if terms is not None:
+            term_ix = terms[term_ix]
+    # the terms of each topic are the union of its top terms over all values of lambda,
+    # kept in order of first appearance
+    topic_ix, term_ix = _unique_topic_terms(topic_ix, term_ix, W)
+    return topic_ix, term_ix, log_ttd[topic_ix, term_ix], log_lift[topic_ix, term_ix]
+
+
+def _log_dists(dists, term_proportion):
+    """Log probabilities and log lifts of the dense topic-term probabilities `dists`, for
+    terms with the given `term_proportion`, rounded like those of :func:`_term_statistics`.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_lift = np.divide(dists, term_proportion, out=np.empty_like(dists))
+        return np.log(dists), np.log(log_lift, out=log_lift)
+
+
+def _top_relevance(log_ttd, log_lift, R, lambda_seq):
+    """:func:`_find_relevance`, along with the relevance of the top terms, NaN being -inf.
+
+    Returns
+    -------
+    top_terms, relevance : array, shape (`len(lambda_seq)`, `n_topics`, `R`)
+    """
+    top_terms = _find_relevance(log_ttd, log_lift, R, lambda_seq)
+    lambda_ = np.asarray(lambda_seq, dtype=log_ttd.dtype)[:, None, None]
+    with np.errstate(invalid='ignore'):
+        relevance = (lambda_ * np.take_along_axis(log_ttd[None], top_terms, axis=2) +
+                     (1 - lambda_) * np.take_along_axis(log_lift[None], top_terms, axis=2))
+    relevance[np.isnan(relevance)] = -np.inf
+    return top_terms, relevance
+
+
+def _merge_top_terms(top_terms, relevance, block_terms, block_relevance, R):
+    """The `R` most relevant terms of two sets of top terms with their relevance, shape
+    (`n_lambdas`, `n_topics`, `n_terms`), ordered like :func:`_top_terms` (ties are broken
+    by the lowest index). They are merged for blocks of topics at a time.
+    """
+    n_lambdas, K = top_terms.shape[:2]
+    R = min(R, top_terms.shape[2] + block_terms.shape[2])
+    merged_terms = np.empty((n_lambdas, K, R), dtype=top_terms.dtype)
+    merged_relevance = np.empty((n_lambdas, K, R), dtype=relevance.dtype)
+    topic_block = max(1, _RELEVANCE_BLOCK_SIZE // (n_lambdas * 2 * R))
+    for k in range(0, K, topic_block):
+        ks = slice(k, k + topic_block)
+        terms = np.concatenate([top_terms[:, ks], block_terms[:, ks]], axis=2)
+        values = np.concatenate([relevance[:, ks], block_relevance[:, ks]], axis=2)
+        order = np.lexsort((terms, -values), axis=2)[..., :R]
+        merged_terms[:, ks] = np.take_along_axis(terms, order, axis=2)
+        merged_relevance[:, ks] = np.take_along_axis(values, order, axis=2)
+    return merged_terms, merged_relevance
+
+
+def _blockwise_relevant_terms(topic_term_dists, term_proportion, lambda_step, R,
+                              term_block_size):
+    """:func:`_relevant_terms` of a dense `topic_term_dists`, read for blocks of
+    `term_block_size` terms at a time so that memory depends on the block size rather than
+    on the size of the vocabulary.
+
+    A first pass keeps the `R` most relevant terms of every topic at the points of a coarse
+    grid of lambdas, merging them with the top terms of each block in buffers of `R` terms.
+    These bound the relevance as in :func:`_relevance_candidates`, and a second pass only
+    searches the candidates of each block, on the grid of `lambda_step` or, for `'exact'`,
+    by following the points where their relevance cross. The result is the same as with
+    the whole vocabulary at once.
+    """
+    K, W = topic_term_dists.shape
+    dtype = topic_term_dists.dtype
+    blocks = [slice(start, min(start + term_block_size, W))
+              for start in range(0, W, term_block_size)]
+    exact = lambda_step == 'exact'
+    if exact:
+        grid = _EXACT_LAMBDA_GRID
+    else:
+        lambda_seq = np.arange(0, 1 + lambda_step, lambda_step)
+        grid = np.linspace(0, lambda_seq[-1], len(_EXACT_LAMBDA_GRID))
+    # a coarse enough grid of lambdas is searched in a single pass
+    single_pass = not exact and len(lambda_seq) <= len(grid)
+    if single_pass:
+        grid = lambda_seq
+
+    # top terms at the grid points, and the largest finite log value for the rounding slack
+    top_terms = np.empty((len(grid), K, 0), dtype=np.intp)
+    top_relevance = np.empty(top_terms.shape, dtype=dtype)
+    scale = 0
+    for block in blocks:
+        log_ttd, log_lift = _log_dists(topic_term_dists[:, block], term_proportion[block])
+        block_terms, block_relevance = _top_relevance(log_ttd, log_lift,
+                                                      min(R, log_ttd.shape[1]), grid)
+        top_terms, top_relevance = _merge_top_terms(top_terms, top_relevance,
+                                                    block_terms + block.start, block_relevance, R)
+        scale = max(scale, np.max(np.abs(log_ttd), where=np.isfinite(log_ttd), initial=0),
+                    np.max(np.abs(log_lift), where=np.isfinite(log_lift), initial=0))
+
+    if not single_pass:
+        # the envelopes of the top terms of each grid point, at the next/previous point
+        slack = _CANDIDATE_SLACK * np.finfo(dtype).eps * scale
+        grid = np.asarray(grid, dtype=dtype)[:, None, None]
+        top_ttd, top_lift = _log_dists(topic_term_dists[np.arange(K)[:, None], top_terms],
+                                       term_proportion[top_terms])
+        with np.errstate(invalid='ignore'):
+            next_relevance = grid[1:] * top_ttd[:-1] + (1 - grid[1:]) * top_lift[:-1]
+            prev_relevance = grid[:-1] * top_ttd[1:] + (1 - grid[:-1]) * top_lift[1:]
+        next_relevance[np.isnan(next_relevance)] = -np.inf
+        prev_relevance[np.isnan(prev_relevance)] = -np.inf
+        cutoff = top_relevance[:, :, -1:] - slack
+        next_cutoff = next_relevance.min(axis=2)[..., None] - slack
+        prev_cutoff = prev_relevance.min(axis=2)[..., None] - slack
+
+        top_terms = np.empty((0 if exact else len(lambda_seq), K, 0),
+                             dtype=np.intp)
+        top_relevance = np.empty(top_terms.shape, dtype=dtype)
+        exact_topics, exact_terms = [], []
+        n_kept = 0
+        for block in blocks:
+            log_ttd, log_lift = _log_dists(topic_term_dists[:, block], term_proportion[block])
+            n_terms = log_ttd.shape[1]
+            candidates = np.empty((K, n_terms), dtype=bool)
+            topic_block = max(1, min(K, _RELEVANCE_BLOCK_SIZE // (len(grid) * n_terms)))
+            for k in range(0, K, topic_block):
+                ks = slice(k, k + topic_block)
+                with np.errstate(invalid='ignore'):
+                    relevance = grid * log_ttd[ks] + (1 - grid) * log_lift[ks]
+                relevance[np.isnan(relevance)] = -np.inf
+                candidates[ks] = _above_envelopes(relevance, cutoff[:, ks], next_cutoff[:, ks],
+                                                  prev_cutoff[:, ks])
+            if exact:
+                candidates &= np.isfinite(log_ttd) & np.isfinite(log_lift)
+                topic_ix, term_ix = np.nonzero(candidates)
+                exact_topics.append(topic_ix)
+                exact_terms.append(term_ix + block.start)
+                continue
+            terms = np.flatnonzero(candidates.any(axis=0))
+            n_kept += len(terms)
+            if len(terms):
+                block_terms, block_relevance = _top_relevance(
+                    log_ttd[:, terms], log_lift[:, terms], min(R, len(terms)), lambda_seq)
+                top_terms, top_relevance = _merge_top_terms(
+                    top_terms, top_relevance, terms[block_terms] + block.start, block_relevance,
+                    R)
+
+    if exact:
+        exact_topics, exact_terms = np.concatenate(exact_topics), np.concatenate(exact_terms)
+        # group the candidates by topic, keeping them in increasing term order
+        order = np.argsort(exact_topics, kind='stable')
+        bounds = np.searchsorted(exact_topics[order], np.arange(K + 1))
+        exact_terms = exact_terms[order]
+        topic_ix, term_ix = [], []
+        for k in range(K):
+            terms = exact_terms[bounds[k]:bounds[k + 1]]
+            log_ttd, log_lift = _log_dists(topic_term_dists[k, terms], term_proportion[terms])
+            top = terms[_exact_top_terms(log_ttd, log_lift, min(R, len(terms)))]
+            topic_ix.append(np.full(len(top), k))
+            term_ix.append(top)
+        topic_ix, term_ix = np.concatenate(topic_ix), np.concatenate(term_ix)
+    else:
+        if not single_pass:
+            logging.info('Pruned %d of %d terms that cannot be among the %d most relevant '
+                         'terms of any topic' % (W - n_kept, W, R))
+        topic_ix = np.repeat(np.arange(K), top_terms.shape[0] * R)
+        term_ix = top_terms.transpose(1, 0, 2).ravel()
+    topic_ix, term_ix = _unique_topic_terms(topic_ix, term_ix, W)
+    logprob, loglift = _log_dists(topic_term_dists[topic_ix, term_ix], term_proportion[term_ix])
+    return topic_ix, term_ix, logprob, loglift
+
+
+def _topic_info(topic_term_dists, topic_order, topic_freq, term_frequency, vocab, saliency,
+                relevant_terms, R, start_index=1):
+    # `topic_term_dists`, `topic_freq`, `saliency` and `relevant_terms` are in the original
+    # topic order; the topics are numbered following `topic_order`.
+    K = topic_term_dists.shape[0]
+
+    # Order the terms for the "default" view by decreasing saliency, selecting the top R
+    # terms without sorting the whole vocabulary:
+    default_ix = _top_terms(saliency[None].copy(), R)[0]
     # Rounding Freq and Total to integer values to match LDAvis code:
-    default_term_info['Freq'] = np.floor(default_term_info['Freq'])
-    default_term_info['Total'] = np.floor(default_term_info['Total'])
     ranks = np.arange(R, 0, -1)
-    default_term_info['logprob'] = default_term_info['loglift'] = ranks
-    default_term_info = default_term_info.reindex(columns=[
-        "Term", "Freq", "Total", "Category", "logprob", "loglift"
-    ])
-
-    # compute relevance and top terms for each topic
-    log_lift = np.log(pd.eval("topic_term_dists / term_proportion")).astype("float64")
-    log_ttd = np.log(pd.eval("topic_term_dists")).astype("float64")
-    lambda_seq = np.arange(0, 1 + lambda_step, lambda_step)
-
-    def topic_top_term_df(tup):
-        new_topic_id, (original_topic_id, topic_terms) = tup
-        term_ix = topic_terms.unique()
-        df = pd.DataFrame({'Term': vocab[term_ix],
-                           'Freq': term_topic_freq.loc[original_topic_id, term_ix],
-                           'Total': term_frequency[term_ix],
-                           'Category': 'Topic%d' % new_topic_id,
-                           'logprob': log_ttd.loc[original_topic_id, term_ix].round(4),
-                           'loglift': log_lift.loc[original_topic_id, term_ix].round(4),
-                           })
-        return df.reindex(columns=[
-            "Term", "Freq", "Total", "Category", "logprob", "loglift"
-        ])
-
-    top_terms = pd.concat(Parallel(n_jobs=n_jobs)
-                          (delayed(_find_relevance_chunks)(log_ttd, log_lift, R, ls)
-                          for ls in _job_chunks(lambda_seq, n_jobs)))
-    topic_dfs = map(topic_top_term_df, enumerate(top_terms.T.iterrows(), start_index))
-    return pd.concat([default_term_info] + list(topic_dfs))
-
-
-def _token_table(topic_info, term_topic_freq, vocab, term_frequency, start_index=1):
+    default_term_info = pd.DataFrame({
+        'Term': vocab[default_ix],
+        'Freq': np.floor(term_frequency[default_ix]),
+        'Total': np.floor(term_frequency[default_ix]),
+        'Category': 'Default',
+        'logprob': ranks,
+        'loglift': ranks},
+        index=default_ix)
+
+    # group the terms by topic number, keeping the order of the terms of each topic
+    topic_rank = np.empty(K, dtype=np.intp)
+    topic_rank[topic_order] = np.arange(K)
+    topic_ix, term_ix, logprob, loglift = relevant_terms
+    order = np.argsort(topic_rank[topic_ix], kind='stable')
+    topic_ix, term_ix, logprob, loglift = (topic_ix[order], term_ix[order], logprob[order],
+                                           loglift[order])
+    probs = topic_term_dists[topic_ix, term_ix]
+    if issparse(topic_term_dists):
+        probs = np.asarray(probs).ravel()
+
+    categories = np.array(['Topic%d' % k for k in range(start_index, K + start_index)])
+    topic_term_info = pd.DataFrame({
+        'Term': vocab[term_ix],
+        # token counts for each term-topic combination (widths of red bars)
+        'Freq': probs * topic_freq[topic_ix],
+        'Total': term_frequency[term_ix],
+        'Category': categories[topic_rank[topic_ix]],
+        'logprob': logprob.astype(np.float64).round(4),
+        'loglift': loglift.astype(np.float64).round(4)},
+        index=term_ix)
+    return pd.concat([default_term_info, topic_term_info])
+
+
+def _token_table(topic_info, topic_term_dists, topic_order, topic_freq, vocab, term_frequency,
+                 start_index=1):
     # last, to compute the areas of the circles when a term is highlighted
     # we must gather all unique terms that could show up (for every combination
     # of topic and value of lambda) and compute its distribution over topics.
 
-    # term-topic frequency table of unique terms across all topics and all values of lambda
-    term_ix = topic_info.index.unique()
-    term_ix = np.sort(term_ix)
+    # term-topic frequency table of unique terms across all topics and all values of lambda,
+    # built for blocks of terms and keeping only the entries that are sent to the browser
+    term_ix = np.unique(topic_info.index.values)
+    K = topic_term_dists.shape[0]
+    block = max(1, _TERM_BLOCK_SIZE // K)
+    terms, topics, freqs = [], [], []
+    for start in range(0, len(term_ix), block):
+        block_terms = term_ix[start:start + block]
+        dists = topic_term_dists[:, block_terms]
+        if issparse(dists):
+            dists = dists.toarray()
+        # token counts of the (term, topic) pairs, term by term
+        freq = (dists * topic_freq[:, None]).T
+        # we filter to Freq >= 0.5 to avoid sending too much data to the browser
+        term_pos, topic = np.nonzero(freq >= 0.5)
+        terms.append(block_terms[term_pos])
+        topics.append(topic)
+        freqs.append(freq[term_pos, topic])
+    terms, topics, freqs = map(np.concatenate, (terms, topics, freqs))
 
-    top_topic_terms_freq = term_topic_freq[term_ix]
     # use the new ordering for the topics
-    K = len(term_topic_freq)
-    top_topic_terms_freq.index = range(start_index, K + start_index)
-    top_topic_terms_freq.index.name = 'Topic'
+    topic_rank = np.empty(K, dtype=np.intp)
+    topic_rank[topic_order] = np.arange(K)
+    topics = topic_rank[topics] + start_index
+    # Normalize token frequencies:
+    freqs = np.round(freqs) / term_frequency[terms]
+    # sort by term and topic; the terms are ranked by their string once per unique term
+    # (terms with the same string keep the order of their indices)
+    _, term_rank = np.unique(vocab[term_ix], return_inverse=True)
+    order = np.lexsort((topics, term_rank[np.searchsorted(term_ix, terms)]))
+    terms = terms[order]
+    return pd.DataFrame({'Topic': topics[order], 'Freq': freqs[order], 'Term': vocab[terms]},
+                        index=pd.Index(terms, name='term'))
 
-    # we filter to Freq >= 0.5 to avoid sending too much data to the browser
-    token_table = pd.DataFrame({'Freq': top_topic_terms_freq.unstack()})\
-        .reset_index().set_index('term').query('Freq >= 0.5')
 
-    token_table['Freq'] = token_table['Freq'].round()
-    token_table['Term'] = vocab[token_table.index.values].values
-    # Normalize token frequencies:
-    token_table['Freq'] = token_table.Freq / term_frequency[token_table.index]
-    return token_table.sort_values(by=['Term', 'Topic'])
+# version of the cache entries' layout; changing it leaves the older entries unused
+_CACHE_VERSION = 1
+_PREPARED_FRAMES = ('topic_coordinates', 'topic_info', 'token_table')
+
+
+def _mds_name(mds):
+    """A name identifying the `mds` function across processes, or None if there is none
+    (lambdas, closures, partials...).
+    """
+    name = getattr(mds, '__qualname__', None)
+    if name is None or '<' in name:
+        return None
+    return '%s.%s' % (mds.__module__, name)
+
+
+def _cache_key(topic_term_dists, topic_freq, vocab, topic_distances, params):
+    """Hash of everything the prepared data depends on.
+
+    The documents only enter through `topic_freq`, and `term_frequency` is not
+    used since it is recomputed from the model, so no input larger than the
+    topic-term matrix is hashed.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(json.dumps([_CACHE_VERSION, params], sort_keys=True, default=str).encode())
+    if issparse(topic_term_dists):
+        arrays = [topic_term_dists.data, topic_term_dists.indices, topic_term_dists.indptr]
+    else:
+        arrays = [topic_term_dists]
+    arrays.append(topic_freq)
+    if topic_distances is not None:
+        arrays.append(topic_distances.condensed)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        hasher.update(('%s%s' % (array.dtype.str, array.shape)).encode())
+        hasher.update(array)
+    hasher.update('\0'.join(map(str, vocab)).encode())
+    return hasher.hexdigest()
+
+
+def _save_prepared(path, prepared):
+    """Saves `prepared` in a `.npz` archive, one array per column. Strings are stored
+    as their concatenated UTF-8 encodings and offsets, which is far more compact
+    than fixed-width unicode arrays for vocabularies with a few long terms.
+    """
+    arrays, frames = {}, {}
+    for name in _PREPARED_FRAMES:
+        df = getattr(prepared, name)
+        strings = []
+        for i, column in enumerate(df.columns):
+            values = df[column]
+            if values.dtype.kind in 'biuf':
+                arrays['%s.%d' % (name, i)] = values.to_numpy()
+            elif pd.api.types.infer_dtype(values) == 'string':
+                encoded = [value.encode() for value in values]
+                arrays['%s.%d' % (name, i)] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+                arrays['%s.%d.offsets' % (name, i)] = np.cumsum([0] + [len(e) for e in encoded])
+                strings.append(i)
+            else:
+                # e.g. a vocabulary of numbers, which is not worth a format of its own
+                return False
+        arrays[name + '.index'] = df.index.to_numpy()
+        frames[name] = {'columns': list(df.columns), 'index': df.index.name, 'strings': strings}
+    meta = {'R': prepared.R, 'lambda_step': prepared.lambda_step,
+            'plot_opts': prepared.plot_opts, 'topic_order': prepared.topic_order,
+            'frames': frames}
+    arrays['meta'] = np.array(json.dumps(meta, cls=NumPyEncoder))
+
+    # write to a temporary file first, so that no other process reads a partial entry
+    folder = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return True
+
+
+def _load_prepared(path):
+    """Reads the prepared data saved by :func:`_save_prepared`."""
+    with np.load(path) as arrays:
+        meta = json.loads(str(arrays['meta']))
+        frames = {}
+        for name, frame in meta['frames'].items():
+            columns = {}
+            for i, column in enumerate(frame['columns']):
+                values = arrays['%s.%d' % (name, i)]
+                if i in frame['strings']:
+                    data = values.tobytes()
+                    offsets = arrays['%s.%d.offsets' % (name, i)]
+                    values = np.array([data[start:stop].decode()
+                                       for start, stop in zip(offsets[:-1], offsets[1:])],
+                                      dtype=object)
+                columns[column] = values
+            index = pd.Index(arrays[name + '.index'], name=frame['index'])
+            frames[name] = pd.DataFrame(columns, index=index)
+    return PreparedData(frames['topic_coordinates'], frames['topic_info'],
+                        frames['token_table'], meta['R'], meta['lambda_step'],
+                        meta['plot_opts'], meta['topic_order'])
+
+
+def _evict(cache_dir, cache_size, keep=None):
+    """Removes the least recently used entries of `cache_dir`, other than `keep`, until
+    the remaining ones take at most `cache_size` bytes.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.npz') and entry.path != keep:
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    if keep is not None:
+        total += os.path.getsize(keep)
+    for _, size, path in sorted(entries):
+        if total <= cache_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # already removed by another process
+            pass
+        total -= size
+
+
+def _parse_mds(mds):
+    if isinstance(mds, str):
+        mds = mds.lower()
+        if mds == 'pcoa':
+            mds = js_PCoA
+        elif mds in ('mmds', 'tsne', 'landmark'):
+            mds_opts = {'mmds': js_MMDS, 'tsne': js_TSNE, 'landmark': js_LMDS}
+            mds = mds_opts[mds]
+        else:
+            logging.warning('Unknown mds `%s`, switch to PCoA' % mds)
+            mds = js_PCoA
+    return mds
+
+
+def _format_bytes(n_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n_bytes < 1024:
+            break
+        n_bytes /= 1024
+    else:
+        unit = 'TB'
+    return '%.1f %s' % (n_bytes, unit)
+
+
+def _memory_estimate(shape, n_docs, dtype, term_block_size=None, n_workers=1, executor=None,
+                     input_copy=True, nnz=None, R=30, n_lambdas=101, mds=js_PCoA):
+    """Estimated memory, in bytes, allocated by :func:`prepare` on top of its inputs, for
+    a topic-term matrix of the given `shape` (with `nnz` nonzeros when sparse) and `dtype`,
+    and `n_docs` documents.
+
+    `n_workers` is the number of relevance workers, and of tasks the distances between
+    topics are split into for the `executor` computing them. `input_copy` tells whether
+    the topic-term matrix is converted.
+    The estimate is for the default `R` and `lambda_step` (i.e. `n_lambdas`), and for the
+    topic layout of the given `mds`. The memory of a custom `mds` is not counted.
+
+    Returns
+    -------
+    held : int
+        The memory held from start to end: the converted topic-term matrix, the vectors
+        over the terms and the distances between topics.
+    stages : dict
+        The memory of each stage on top of `held`. The stages run one after the other,
+        so the peak is `held` plus the largest of them.
+    """
+    K, W = shape
+    itemsize = np.dtype(dtype).itemsize
+    if nnz is None:
+        # dense values (and the intermediate log values) of the full matrix
+        full = K * W * itemsize
+    else:
+        # values and column indices of the nonzeros
+        full = nnz * (itemsize + 4)
+    process_workers = 0
+    js_workers = 1
+    if executor is not None:
+        js_workers = n_workers
+        # process workers each receive their own copy of the (block of) distributions
+        if not isinstance(executor, ThreadPoolExecutor):
+            process_workers = js_workers
+    # the top terms of every (lambda, topic) pair and their (topic, term) indices
+    top_terms = 3 * n_lambdas * K * R * 8
+    # relevance (and a temporary), argpartition indices and masks of one block of
+    # (lambda, topic) pairs
+    relevance_buffers = _RELEVANCE_BLOCK_SIZE * (2 * itemsize + 10)
+    term_buffers = 4 * min(_TERM_BLOCK_SIZE, K * W) * 8
+
+    held = (full if input_copy else 0) + 3 * W * 8
+    if mds in (js_PCoA, js_MMDS, js_TSNE):
+        # the distances between all the topics
+        held += K * (K - 1) // 2 * 8
+    if nnz is not None:
+        stages = {'topic distances': (2 + process_workers) * full,
+                  'saliency': 3 * nnz * 8,
+                  'relevance': 2 * W * 8 + top_terms}
+    elif term_block_size is None:
+        stages = {'topic distances': (2 + process_workers) * full +
+                  js_workers * 4 * max(_JS_BLOCK_SIZE, W) * itemsize,
+                  # the log probabilities and lifts are held until the relevance is found
+                  'saliency': 2 * full + term_buffers,
+                  # the log values of the terms kept by the pruning (at most half of them)
+                  'relevance': 3 * full + K * W + n_workers * relevance_buffers + top_terms}
+    else:
+        block = K * min(term_block_size, W) * itemsize
+        stages = {'topic distances': (2 + process_workers) * block +
+                  js_workers * 4 * max(_JS_BLOCK_SIZE, term_block_size) * itemsize,
+                  'saliency': term_buffers,
+                  # the log probabilities, lifts and candidates of a block, and the top terms
+                  # with their relevance: merged so far, of the block and merging
+                  'relevance': 3 * block + relevance_buffers + top_terms +
+                  3 * n_lambdas * K * R * (8 + itemsize)}
+    # a chunk of documents converted to an array
+    stages['documents'] = min(n_docs, _DOC_CHUNK_SIZE) * K * 8
+    stages['token table'] = term_buffers
+    if mds in (js_PCoA, js_MMDS, js_TSNE):
+        # the double-centered distances and the eigenvectors of the topic layout
+        stages['topic layout'] = 4 * K * K * 8
+    else:
+        # the distances are only computed by the built-in functions using all of them
+        del stages['topic distances']
+        if mds is js_LMDS:
+            # the normalized distributions, the distances between the landmarks and every
+            # topic (and their squares), and the double-centered landmark distances
+            n_landmarks = min(200, K)
+            stages['topic layout'] = (full + 4 * max(_JS_BLOCK_SIZE, W) * itemsize +
+                                      3 * n_landmarks * K * 8 + 4 * n_landmarks ** 2 * 8)
+    return held, stages
+
+
+def _memory_plan(max_memory, topic_term_dists, n_docs, dtype, term_block_size, n_jobs,
+                 executor, mds=js_PCoA):
+    """The `dtype`, `term_block_size` and `n_jobs` with which :func:`prepare` is estimated to
+    allocate at most `max_memory` bytes on top of its inputs (see :func:`_memory_estimate`).
+
+    The options that change the results the least are tried first: fewer relevance workers,
+    then blocks of terms (from the largest), then float32 instead of float64. Raises a
+    `MemoryError` with the smallest estimate when none fits.
+    """
+    sparse = issparse(topic_term_dists)
+    if hasattr(topic_term_dists, 'shape'):
+        shape = topic_term_dists.shape
+    else:
+        shape = (len(topic_term_dists), len(topic_term_dists[0]))
+    nnz = topic_term_dists.nnz if sparse else None
+    dtypes = [dtype]
+    if dtype.itemsize > 4:
+        dtypes.append(np.dtype(np.float32))
+    workers = [effective_n_jobs(n_jobs)]
+    # the work is split into as many tasks as the executor is said to have workers
+    if executor is None:
+        while workers[-1] > 1:
+            workers.append(workers[-1] // 2)
+    if term_block_size is not None or sparse:
+        block_sizes = [term_block_size]
+    else:
+        # the largest blocks first, down to blocks of 1024 terms
+        block_sizes = [None] + [2 ** i for i in range(int(np.log2(max(shape[1], 2) - 1)), 9, -1)]
+
+    smallest = None
+    for dt in dtypes:
+        if sparse:
+            input_copy = not (isinstance(topic_term_dists, csr_matrix) and
+                              topic_term_dists.dtype == dt)
+        else:
+            input_copy = not (isinstance(topic_term_dists, np.ndarray) and
+                              topic_term_dists.dtype == dt and
+                              topic_term_dists.flags.c_contiguous)
+        for block_size in block_sizes:
+            # the relevance is only parallel without blocks of terms
+            for n_workers in (workers if block_size is None else workers[-1:]):
+                held, stages = _memory_estimate(shape, n_docs, dt, block_size, n_workers,
+                                                executor, input_copy, nnz, mds=mds)
+                total = held + max(stages.values())
+                if total <= max_memory:
+                    if (dt, block_size, n_workers) != (dtype, term_block_size, workers[0]):
+                        logging.info('Preparing with dtype=%s, term_block_size=%s and '
+                                     'n_jobs=%d to stay within max_memory=%s (estimated %s)'
+                                     % (dt, block_size, n_workers, _format_bytes(max_memory),
+                                        _format_bytes(total)))
+                    return dt, block_size, n_jobs if n_workers == workers[0] else n_workers
+                if smallest is None or total < smallest[0]:
+                    smallest = total, held, stages
+    total, held, stages = smallest
+    breakdown = ', '.join('%s %s' % (stage, _format_bytes(size))
+                          for stage, size in sorted(stages.items(), key=lambda item: -item[1]))
+    raise MemoryError('prepare is estimated to need at least %s on top of its inputs, more '
+                      'than max_memory=%s: %s held throughout, plus up to %s '
+                      '(%s)' % (_format_bytes(total), _format_bytes(max_memory),
+                                _format_bytes(held), _format_bytes(max(stages.values())),
+                                breakdown))
+
+
+class PreparedModel:
+    """A topic model with the statistics of it that do not depend on how it is displayed,
+    from which :meth:`prepare` makes the :class:`PreparedData` for any display parameters.
+
+    The saliency of the terms, the log probabilities and lifts, the distances between
+    topics and the relevant terms for each `R` and `lambda_step` are computed when first
+    needed and kept for the next calls, so changing `sort_topics`, `mds`, `start_index`
+    or `plot_opts` only reorders the terms and recomputes the topic layout.
+
+    The parameters are the same as those of :func:`prepare`, where `mds` is only the
+    topic layout that `max_memory` is planned for. Note that, unless
+    `term_block_size` is given, the model keeps the log probabilities and lifts of a dense
+    `topic_term_dists`, which take twice its memory.
+    """
+
+    def __init__(self, topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequency,
+                 n_jobs=-1, topic_distances=None, sparse_epsilon=1e-12, dtype=np.float64,
+                 topic_freq=None, validate='full', validate_tol=1e-3, executor=None,
+                 term_block_size=None, max_memory=None, mds=js_PCoA):
+        if validate not in ('full', 'sample', 'none'):
+            raise ValueError("validate must be 'full', 'sample' or 'none', not %r" % validate)
+        if term_block_size is not None and term_block_size < 1:
+            raise ValueError('term_block_size must be a positive number of terms, not %r'
+                             % term_block_size)
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError('dtype must be a floating point type, not %s' % dtype)
+        if max_memory is not None:
+            # fail before allocating anything when the budget cannot be met
+            if topic_freq is not None:
+                n_docs = 0
+            elif doc_lengths is None:
+                n_docs = _DOC_CHUNK_SIZE
+            else:
+                n_docs = len(doc_lengths)
+            dtype, term_block_size, n_jobs = _memory_plan(
+                max_memory, topic_term_dists, n_docs, dtype, term_block_size, n_jobs, executor,
+                _parse_mds(mds))
+
+        # everything is computed on plain arrays; the input is not copied when it already is
+        # a C-contiguous array of `dtype` (or a CSR matrix without explicit zeros)
+        if issparse(topic_term_dists):
+            topic_term_dists = csr_matrix(topic_term_dists, dtype=dtype)
+            if not topic_term_dists.data.all():
+                topic_term_dists = topic_term_dists.copy()
+                topic_term_dists.eliminate_zeros()
+        else:
+            topic_term_dists = np.ascontiguousarray(topic_term_dists, dtype=dtype)
+        term_frequency = np.asarray(term_frequency)
+        vocab = np.asarray(vocab, dtype=object)
+        K = topic_term_dists.shape[0]
+        # the documents are only needed for the topic frequencies, which are accumulated
+        # (and the documents validated) in a single pass over chunks of documents
+        if topic_freq is None:
+            topic_freq, doc_errors = _topic_frequency(doc_topic_dists, doc_lengths, K, validate,
+                                                      validate_tol)
+        else:
+            topic_freq = np.asarray(topic_freq, dtype=np.float64).ravel()
+            doc_errors = []
+            if len(topic_freq) != K:
+                doc_errors.append('Length of topic_freq not equal to the number of rows of '
+                                  'topic_term_dists; both should be equal to the number of '
+                                  'topics in the model.')
+        _input_validate(topic_term_dists, vocab, term_frequency, doc_errors, validate,
+                        validate_tol)
+        if topic_distances is not None and topic_distances.n_topics != K:
+            raise ValidationError('topic_distances are for %d topics, but topic_term_dists has '
+                                  '%d.' % (topic_distances.n_topics, K))
+
+        self.topic_term_dists = topic_term_dists
+        self.vocab = vocab
+        self.topic_freq = topic_freq
+        self.topic_proportion = topic_freq / topic_freq.sum()
+        # Quick fix for red bar width bug.  We calculate the
+        # term frequencies internally, using the topic term distributions and the
+        # topic frequencies, rather than using the user-supplied term frequencies.
+        # For a detailed discussion, see: https://github.com/cpsievert/LDAvis/pull/41
+        self.term_frequency = topic_term_dists.T.dot(topic_freq.astype(dtype)).astype(np.float64)
+        # marginal distribution over terms (width of blue bars)
+        self.term_proportion = self.term_frequency / self.term_frequency.sum()
+        self.n_jobs = n_jobs
+        self.sparse_epsilon = sparse_epsilon
+        self.executor = executor
+        self.term_block_size = term_block_size
+        self._topic_distances = topic_distances
+        self._saliency = None
+        self._log_dists = None
+        self._relevant_terms = {}
+
+    @property
+    def saliency(self):
+        """The saliency of every term, which orders the terms shown when no topic is selected."""
+        # compute the distinctiveness and saliency of the terms:
+        # this determines the R terms that are displayed when no topic is selected.
+        if self._saliency is None:
+            if issparse(self.topic_term_dists):
+                self._saliency = _sparse_saliency(self.topic_term_dists, self.topic_proportion,
+                                                  self.term_proportion)
+            elif self.term_block_size is not None:
+                _, _, self._saliency = _term_statistics(
+                    self.topic_term_dists, self.topic_proportion, self.term_proportion,
+                    log_dists=False)
+            else:
+                self._term_statistics()
+        return self._saliency
+
+    def _term_statistics(self):
+        # a dense model's saliency, log probabilities and lifts are computed together
+        log_ttd, log_lift, self._saliency = _term_statistics(
+            self.topic_term_dists, self.topic_proportion, self.term_proportion)
+        self._log_dists = log_ttd, log_lift
+
+    @property
+    def topic_distances(self):
+        """The :class:`TopicDistances` between the topics."""
+        if self._topic_distances is None:
+            self._topic_distances = TopicDistances.from_distributions(
+                self.topic_term_dists, executor=self.executor,
+                term_block_size=self.term_block_size, n_jobs=self.n_jobs)
+        return self._topic_distances
+
+    def relevant_terms(self, R, lambda_step):
+        """The most relevant terms of every topic for the given `R` and `lambda_step`, as
+        (topic, term) index pairs with their log probabilities and log lifts.
+        """
+        key = (R, lambda_step)
+        if key in self._relevant_terms:
+            return self._relevant_terms[key]
+        if self.term_block_size is not None and not issparse(self.topic_term_dists):
+            # the log probabilities and lifts are only computed for one block at a time
+            self._relevant_terms[key] = _blockwise_relevant_terms(
+                self.topic_term_dists, self.term_proportion, lambda_step, R,
+                self.term_block_size)
+        else:
+            log_ttd = log_lift = None
+            if not issparse(self.topic_term_dists):
+                if self._log_dists is None:
+                    self._term_statistics()
+                log_ttd, log_lift = self._log_dists
+            self._relevant_terms[key] = _relevant_terms(
+                self.topic_term_dists, log_ttd, log_lift, self.term_proportion, lambda_step, R,
+                self.n_jobs, self.sparse_epsilon, self.executor)
+        return self._relevant_terms[key]
+
+    def prepare(self, R=30, lambda_step=0.01, mds=js_PCoA, plot_opts=None, sort_topics=True,
+                start_index=1):
+        """Transforms the model into the data structures needed for the visualization.
+        See :func:`prepare` for the parameters.
+
+        Returns
+        -------
+        prepared_data : PreparedData
+        """
+        if plot_opts is None:
+            plot_opts = {'xlab': 'PC1', 'ylab': 'PC2'}
+        if isinstance(lambda_step, str) and lambda_step != 'exact':
+            raise ValueError("lambda_step must be a number or 'exact', not %r" % lambda_step)
+        mds = _parse_mds(mds)
+        R = min(R, len(self.vocab))
+
+        # the topics are numbered following topic_order, but the arrays keep the original
+        # order and are only reordered where needed
+        K = self.topic_term_dists.shape[0]
+        if (sort_topics):
+            topic_order = np.argsort(-self.topic_proportion, kind='stable')
+        else:
+            topic_order = np.arange(K)
+
+        # the built-in functions using all the distances between topics get them from the
+        # model, so that they are computed only once (and before the log probabilities and
+        # lifts, which do not need to be in memory at the same time)
+        topic_distances = self._topic_distances
+        if mds in (js_PCoA, js_MMDS, js_TSNE):
+            topic_distances = self.topic_distances
+        topic_coordinates = _topic_coordinates(mds, self.topic_term_dists,
+                                               self.topic_proportion[topic_order], topic_order,
+                                               start_index, topic_distances)
+        topic_info = _topic_info(self.topic_term_dists, topic_order, self.topic_freq,
+                                 self.term_frequency, self.vocab, self.saliency,
+                                 self.relevant_terms(R, lambda_step), R, start_index)
+        token_table = _token_table(topic_info, self.topic_term_dists, topic_order,
+                                   self.topic_freq, self.vocab, self.term_frequency, start_index)
+        client_topic_order = (topic_order + start_index).tolist()
+
+        return PreparedData(topic_coordinates, topic_info,
+                            token_table, R, lambda_step, plot_opts, client_topic_order)
 
 
 def prepare(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequency,
             R=30, lambda_step=0.01, mds=js_PCoA, n_jobs=-1,
-            plot_opts=None, sort_topics=True, start_index=1):
+            plot_opts=None, sort_topics=True, start_index=1, topic_distances=None,
+            sparse_epsilon=1e-12, dtype=np.float64, topic_freq=None, validate='full',
+            validate_tol=1e-3, executor=None, cache_dir=None, cache_size=2 ** 30,
+            term_block_size=None, max_memory=None):
     """Transforms the topic model distributions and related corpus data into
     the data structures needed for the visualization.
 
     Parameters
     ----------
-    topic_term_dists : array-like, shape (`n_topics`, `n_terms`)
+    topic_term_dists : array-like or sparse matrix, shape (`n_topics`, `n_terms`)
         Matrix of topic-term probabilities. Where `n_terms` is `len(vocab)`.
-    doc_topic_dists : array-like, shape (`n_docs`, `n_topics`)
-        Matrix of document-topic probabilities.
-    doc_lengths : array-like, shape `n_docs`
+        A `scipy.sparse` matrix is never densified, so memory scales with its
+        number of nonzeros. Note that a custom `mds` function is then also
+        given the sparse matrix.
+    doc_topic_dists : array-like, shape (`n_docs`, `n_topics`), or iterable
+        Matrix of document-topic probabilities. It is only read in chunks of
+        documents, so a memory-mapped array (see :func:`numpy.load` with
+        `mmap_mode`) is never fully loaded into memory. Alternatively, an iterable
+        of `(doc_topic_dists, doc_lengths)` batches, for instance a generator
+        streaming a corpus, with `doc_lengths` set to None.
+        Ignored when `topic_freq` is given.
+    doc_lengths : array-like, shape `n_docs`, or None
         The length of each document, i.e. the number of words in each document.
         The order of the numbers should be consistent with the ordering of the
-        docs in `doc_topic_dists`.
+        docs in `doc_topic_dists`. None when `doc_topic_dists` is an iterable
+        of batches.
     vocab : array-like, shape `n_terms`
         List of all the words in the corpus used to train the model.
     term_frequency : array-like, shape `n_terms`
@@ -327,17 +1653,22 @@ def prepare(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequenc
     R : int
         The number of terms to display in the barcharts of the visualization.
         Default is 30. Recommended to be roughly between 10 and 50.
-    lambda_step : float, between 0 and 1
+    lambda_step : float, between 0 and 1, or 'exact'
         Determines the interstep distance in the grid of lambda values over
         which to iterate when computing relevance.
         Default is 0.01. Recommended to be between 0.01 and 0.1.
+        `'exact'` finds the terms that are among the top `R` for any value of
+        lambda by following the points where the relevance of two terms cross,
+        instead of evaluating a grid.
     mds : function or a string representation of function
         A function that takes `topic_term_dists` as an input and outputs a
         `n_topics` by `2`  distance matrix. The output approximates the distance
         between topics. See :func:`js_PCoA` for details on the default function.
         A string representation currently accepts `pcoa` (or upper case variant),
-        `mmds` (or upper case variant) and `tsne` (or upper case variant),
-        if `sklearn` package is installed for the latter two.
+        `mmds` (or upper case variant), `tsne` (or upper case variant),
+        if `sklearn` package is installed for the latter two, and `landmark`
+        (or upper case variant) for :func:`js_LMDS`, which scales to many
+        thousands of topics.
     n_jobs : int
         The number of cores to be used to do the computations. The regular
         joblib conventions are followed so `-1`, which is the default, will
@@ -348,6 +1679,61 @@ def prepare(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequenc
         to keep original topic order.
     start_index: how to number topics for prepared data. Defaults to one-based indexing.
         Set to 0 for zero-based indexing.
+    topic_distances : TopicDistances, optional
+        Precomputed distances between the topics, in the same order as the rows of
+        `topic_term_dists`. When given, `mds` is called with these distances instead
+        of the topic-term distributions, so that they are only computed once when
+        preparing the same model several times. The built-in `mds` functions accept both.
+    sparse_epsilon : float
+        The probability assumed for the zero entries of a sparse `topic_term_dists`
+        when computing log probabilities and lifts. Default is 1e-12.
+    dtype : float32 or float64
+        The floating point type of the topic-term matrix, the log probabilities and
+        lifts derived from it and the distances between topics. float32 halves the
+        memory needed for large vocabularies. Default is float64.
+    topic_freq : array-like, shape `n_topics`, optional
+        Precomputed number of tokens assigned to each topic, i.e.
+        `doc_lengths @ doc_topic_dists`. When given, `doc_topic_dists` and
+        `doc_lengths` are not used and may be None.
+    validate : 'full', 'sample' or 'none'
+        How the rows of `topic_term_dists` and `doc_topic_dists` are checked to be
+        probability distributions. `'full'`, the default, checks every row,
+        `'sample'` a fixed random subset of the rows of `topic_term_dists` and of
+        each chunk of documents, and `'none'` skips the check, e.g. for inputs
+        produced by one of the model adapters. The shapes are always checked.
+    validate_tol : float
+        Rows summing to less than `1 - validate_tol` are not valid distributions.
+        Default is 1e-3.
+    executor : concurrent.futures.Executor, optional
+        A thread or process pool to run the parallel work on instead of starting
+        joblib workers. The work is then split into `n_jobs` tasks, which should be
+        the number of workers of the executor (one per CPU by default). It computes
+        the relevance of the terms and, for the built-in `mds` functions other than
+        :func:`js_LMDS`, the distances between the topics. The model adapters also
+        use it to infer the document-topic distributions.
+    cache_dir : str, optional
+        A directory where the prepared data is cached, keyed by a hash of the
+        topic-term distributions, topic frequencies, vocabulary and parameters, so
+        that preparing the same model again only reads the cached copy. `mds` must
+        be a named function for the results to be cached.
+    cache_size : int
+        The maximum total size in bytes of the entries in `cache_dir`, beyond which
+        the least recently used ones are removed. Default is 1 GiB.
+    term_block_size : int, optional
+        Read a dense `topic_term_dists` for blocks of that many terms at a time when
+        computing the saliency, the relevance and the distances between topics, so
+        that, beyond the input itself, memory depends on the block size rather than
+        on the size of the vocabulary, e.g. for models with millions of terms. The
+        relevant terms are the same. The blocks are processed one after the other,
+        so `n_jobs` is then not used.
+    max_memory : int, optional
+        The number of bytes `prepare` may allocate on top of its inputs. The memory
+        of every stage is estimated from the number of topics, terms and documents
+        and the `dtype`, and if needed fewer `n_jobs`, a `term_block_size` and then
+        float32 are used to stay under it. A `MemoryError` giving the estimate is
+        raised before any computation when that is not enough. The estimate is for
+        the default `R` and `lambda_step`, and the memory of a custom `mds` function
+        is not counted.
 
     Returns
     -------
@@ -369,75 +1755,128 @@ def prepare(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequenc
 
     See Also
     --------
+    :class:`PreparedModel` : prepare the same model for several display parameters
     :func:`save_json`: save json representation of a figure to file
     :func:`save_html` : save html representation of a figure to file
     :func:`show` : launch a local server and show a figure in a browser
     :func:`display` : embed figure within the IPython notebook
     :func:`enable_notebook` : automatically embed visualizations in IPython notebook
    """
+    if isinstance(lambda_step, str) and lambda_step != 'exact':
+        raise ValueError("lambda_step must be a number or 'exact', not %r" % lambda_step)
     if plot_opts is None:
         plot_opts = {'xlab': 'PC1', 'ylab': 'PC2'}
-
-    # parse mds
-    if isinstance(mds, str):
-        mds = mds.lower()
-        if mds == 'pcoa':
-            mds = js_PCoA
-        elif mds in ('mmds', 'tsne'):
-            mds_opts = {'mmds': js_MMDS, 'tsne': js_TSNE}
-            mds = mds_opts[mds]
+    mds = _parse_mds(mds)
+
+    model = PreparedModel(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequency,
+                          n_jobs=n_jobs, topic_distances=topic_distances,
+                          sparse_epsilon=sparse_epsilon, dtype=dtype, topic_freq=topic_freq,
+                          validate=validate, validate_tol=validate_tol, executor=executor,
+                          term_block_size=term_block_size, max_memory=max_memory, mds=mds)
+    R = min(R, len(model.vocab))
+
+    # look the prepared data up before computing anything expensive
+    cache_path = None
+    if cache_dir is not None:
+        params = {'R': R, 'lambda_step': lambda_step, 'mds': _mds_name(mds),
+                  'sort_topics': bool(sort_topics), 'start_index': int(start_index),
+                  'plot_opts': plot_opts, 'sparse_epsilon': sparse_epsilon,
+                  'dtype': model.topic_term_dists.dtype.str}
+        if params['mds'] is None:
+            logging.warning('Not caching the prepared data, `%r` has no importable name' % mds)
         else:
-            logging.warning('Unknown mds `%s`, switch to PCoA' % mds)
-            mds = js_PCoA
-
-    # Conceptually, the items in `topic_term_dists` end up as individual rows in the
-    # DataFrame, but we can speed up ingestion by treating them as columns and
-    # transposing at the end. (This is especially true when the number of terms far
-    # exceeds the number of topics.)
-    topic_term_dist_cols = [
-        pd.Series(topic_term_dist, dtype="float64")
-        for topic_term_dist in topic_term_dists
-    ]
-    topic_term_dists = pd.concat(topic_term_dist_cols, axis=1).T
-
-    topic_term_dists = _df_with_names(topic_term_dists, 'topic', 'term')
-    doc_topic_dists = _df_with_names(doc_topic_dists, 'doc', 'topic')
-    term_frequency = _series_with_name(term_frequency, 'term_frequency')
-    doc_lengths = _series_with_name(doc_lengths, 'doc_length')
-    vocab = _series_with_name(vocab, 'vocab')
-    _input_validate(topic_term_dists, doc_topic_dists, doc_lengths, vocab, term_frequency)
-    R = min(R, len(vocab))
-
-    topic_freq = doc_topic_dists.mul(doc_lengths, axis="index").sum()
-    # topic_freq       = np.dot(doc_topic_dists.T, doc_lengths)
-    if (sort_topics):
-        topic_proportion = (topic_freq / topic_freq.sum()).sort_values(ascending=False)
-    else:
-        topic_proportion = (topic_freq / topic_freq.sum())
+            os.makedirs(cache_dir, exist_ok=True)
+            key = _cache_key(model.topic_term_dists, model.topic_freq, model.vocab,
+                             topic_distances, params)
+            cache_path = os.path.join(cache_dir, key + '.npz')
+            try:
+                prepared = _load_prepared(cache_path)
+                # mark the entry as recently used
+                os.utime(cache_path)
+                return prepared
+            except (OSError, EOFError, KeyError, ValueError, zipfile.BadZipFile):
+                # not cached (or evicted or partially written by another process)
+                pass
+
+    prepared = model.prepare(R, lambda_step, mds, plot_opts, sort_topics, start_index)
+    if cache_path is not None and _save_prepared(cache_path, prepared):
+        _evict(cache_dir, cache_size, keep=cache_path)
+    return prepared
+
+
+def _numeric_json(values):
+    """The JSON array of a numeric column, as written by `json.dumps(values.tolist())`.
+
+    The terms and topics of the frames repeat the same values many times, so unless most
+    values are distinct, each distinct value is formatted once and its text repeated.
+    """
+    keys = values
+    if values.dtype.kind == 'f':
+        # the bits of the values tell apart the ones printed differently, e.g. 0.0 and -0.0
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        keys = values.view(np.int64)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    if len(first) > len(values) // 2:
+        return json.dumps(values.tolist())
+    texts = np.array(json.dumps(values[first].tolist())[1:-1].split(', '), dtype=object)
+    return '[%s]' % ', '.join(texts[inverse].tolist())
+
+
+def _frame_json(frame):
+    """Yields the JSON object of `frame.to_dict(orient='list')` piece by piece, encoding
+    one column at a time: the numeric ones from their arrays, the others from the list
+    of their values.
+    """
+    yield '{'
+    for i, name in enumerate(frame.columns):
+        yield '%s%s: ' % (', ' if i else '', json.dumps(str(name)))
+        values = frame[name].to_numpy()
+        if values.dtype.kind in 'biuf' and len(values):
+            yield _numeric_json(values)
+        else:
+            yield json.dumps(frame[name].tolist(), cls=NumPyEncoder)
+    yield '}'
 
-    topic_order = topic_proportion.index
-    # reorder all data based on new ordering of topics
-    topic_freq = topic_freq[topic_order]
-    topic_term_dists = topic_term_dists.iloc[topic_order]
-    # Unused: doc_topic_dists = doc_topic_dists[topic_order]
 
-    # token counts for each term-topic combination (widths of red bars)
-    term_topic_freq = (topic_term_dists.T * topic_freq).T
-    # Quick fix for red bar width bug.  We calculate the
-    # term frequencies internally, using the topic term distributions and the
-    # topic frequencies, rather than using the user-supplied term frequencies.
-    # For a detailed discussion, see: https://github.com/cpsievert/LDAvis/pull/41
-    term_frequency = np.sum(term_topic_freq, axis=0)
+def _typed_array(values, dtype):
+    """Column of the binary encoding: the name of the typed array decoding `values` in the
+    browser, and their little-endian bytes in base64.
+    """
+    data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': np.dtype(dtype).name, 'data': base64.b64encode(data).decode('ascii')}
 
-    topic_info = _topic_info(topic_term_dists, topic_proportion,
-                             term_frequency, term_topic_freq, vocab, lambda_step, R,
-                             n_jobs, start_index)
-    token_table = _token_table(topic_info, term_topic_freq, vocab, term_frequency, start_index)
-    topic_coordinates = _topic_coordinates(mds, topic_term_dists, topic_proportion, start_index)
-    client_topic_order = [x + start_index for x in topic_order]
 
-    return PreparedData(topic_coordinates, topic_info,
-                        token_table, R, lambda_step, plot_opts, client_topic_order)
+def _binary_frames(frames):
+    """The columns of the `frames` encoded as typed arrays: float32 for floating point
+    values and int32 for integers (float64 beyond its range). The strings are replaced by
+    int32 indices into a single vocabulary, also returned, of all the strings of the frames.
+    Other columns are kept as lists.
+    """
+    encoded = {key: {} for key in frames}
+    strings = []
+    for key, frame in frames.items():
+        for name in frame.columns:
+            values = frame[name].to_numpy()
+            if values.dtype.kind == 'f':
+                encoded[key][name] = _typed_array(values, np.float32)
+            elif values.dtype.kind in 'iub':
+                in_range = not len(values) or (values.min() >= np.iinfo(np.int32).min and
+                                               values.max() <= np.iinfo(np.int32).max)
+                encoded[key][name] = _typed_array(values, np.int32 if in_range else np.float64)
+            elif pd.api.types.is_string_dtype(frame[name]):
+                strings.append((key, name, values))
+            else:
+                encoded[key][name] = frame[name].tolist()
+    vocab = []
+    if strings:
+        codes, vocab = pd.factorize(np.concatenate([values for _, _, values in strings]))
+        vocab = vocab.tolist()
+        bounds = np.cumsum([0] + [len(values) for _, _, values in strings])
+        for (key, name, _), start, stop in zip(strings, bounds[:-1], bounds[1:]):
+            encoded[key][name] = dict(_typed_array(codes[start:stop], np.int32), vocab=True)
+    # keep the order of the columns
+    return {key: {name: encoded[key][name] for name in frame.columns}
+            for key, frame in frames.items()}, vocab
 
 
 class PreparedData(namedtuple('PreparedData', ['topic_coordinates', 'topic_info', 'token_table',
@@ -451,14 +1890,48 @@ class PreparedData(namedtuple('PreparedData', ['topic_coordinates', 'topic_info'
         stdf = tdf.assign(relevance=_lambda * tdf['logprob'] + (1 - _lambda) * tdf['loglift'])
         return stdf.sort_values('relevance', ascending=False)
 
-    def to_dict(self):
-        return {'mdsDat': self.topic_coordinates.to_dict(orient='list'),
-                'tinfo': self.topic_info.to_dict(orient='list'),
-                'token.table': self.token_table.to_dict(orient='list'),
-                'R': self.R,
-                'lambda.step': self.lambda_step,
+    def _frames(self):
+        return {'mdsDat': self.topic_coordinates,
+                'tinfo': self.topic_info,
+                'token.table': self.token_table}
+
+    def _options(self):
+        return {'R': self.R,
+                'lambda.step': (_EXACT_SLIDER_STEP if self.lambda_step == 'exact'
+                                else self.lambda_step),
                 'plot.opts': self.plot_opts,
                 'topic.order': self.topic_order}
 
-    def to_json(self):
-        return json.dumps(self.to_dict(), cls=NumPyEncoder)
+    def to_dict(self, binary=False):
+        """The data of the visualization, with the frames as dictionaries of columns.
+
+        With `binary`, the columns are typed arrays in base64 (see :func:`_binary_frames`)
+        and the strings indices into the list under `'vocab'`, which is much smaller for
+        large vocabularies and faster for the browser to load. Floating point values are
+        then only kept in single precision.
+        """
+        if binary:
+            data, vocab = _binary_frames(self._frames())
+            data.update(self._options())
+            data['vocab'] = vocab
+            return data
+        data = {key: frame.to_dict(orient='list') for key, frame in self._frames().items()}
+        data.update(self._options())
+        return data
+
+    def _json_pieces(self):
+        # the text of json.dumps(self.to_dict(), cls=NumPyEncoder), without building the
+        # dictionaries of the frames: their columns are encoded one at a time
+        yield '{'
+        for key, frame in self._frames().items():
+            yield '%s: ' % json.dumps(key)
+            yield from _frame_json(frame)
+            yield ', '
+        # the options, without the opening brace
+        yield json.dumps(self._options(), cls=NumPyEncoder)[1:]
+
+    def to_json(self, binary=False):
+        """The JSON representation of :meth:`to_dict`."""
+        if binary:
+            return json.dumps(self.to_dict(binary=True), cls=NumPyEncoder)
+        return ''.join(self._json_pieces())
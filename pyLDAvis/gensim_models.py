@@ -10,7 +10,16 @@ from scipy.sparse import issparse
 import pyLDAvis._prepare
 
 
-def _extract_data(topic_model, corpus, dictionary, doc_topic_dists=None):
+def _inference(topic_model, corpus):
+    # If its an HDP model.
+    if hasattr(topic_model, 'lda_beta'):
+        return topic_model.inference(corpus)
+    gamma, _ = topic_model.inference(corpus)
+    return gamma
+
+
+def _extract_data(topic_model, corpus, dictionary, doc_topic_dists=None, dtype=np.float64,
+                  executor=None, n_jobs=-1):
     import gensim
 
     if not gensim.matutils.ismatrix(corpus):
@@ -42,11 +51,14 @@ def _extract_data(topic_model, corpus, dictionary, doc_topic_dists=None):
         num_topics = topic_model.num_topics
 
     if doc_topic_dists is None:
-        # If its an HDP model.
-        if hasattr(topic_model, 'lda_beta'):
-            gamma = topic_model.inference(corpus)
+        if executor is None:
+            gamma = _inference(topic_model, corpus)
         else:
-            gamma, _ = topic_model.inference(corpus)
+            # infer the documents in one chunk per worker of the executor
+            bounds = pyLDAvis._prepare._chunk_bounds(corpus_csc.shape[1], n_jobs)
+            chunks = [gensim.matutils.Sparse2Corpus(corpus_csc[:, start:stop])
+                      for start, stop in bounds]
+            gamma = np.vstack(list(executor.map(_inference, [topic_model] * len(chunks), chunks)))
         doc_topic_dists = gamma / gamma.sum(axis=1)[:, None]
     else:
         if isinstance(doc_topic_dists, list):
@@ -66,7 +78,7 @@ def _extract_data(topic_model, corpus, dictionary, doc_topic_dists=None):
     else:
         topic = topic_model.state.get_lambda()
     topic = topic / topic.sum(axis=1)[:, None]
-    topic_term_dists = topic[:, fnames_argsort]
+    topic_term_dists = topic[:, fnames_argsort].astype(dtype, copy=False)
 
     assert topic_term_dists.shape[0] == doc_topic_dists.shape[1]
 
@@ -104,6 +116,8 @@ def prepare(topic_model, corpus, dictionary, doc_topic_dist=None, **kwargs):
 
     **kwargs :
         additional keyword arguments are passed through to :func:`pyldavis.prepare`.
+        `dtype` is also used for the topic-term distributions taken from the model,
+        and `executor` to infer the document-topic distributions in `n_jobs` chunks.
 
     Returns
     -------
@@ -119,5 +133,7 @@ def prepare(topic_model, corpus, dictionary, doc_topic_dist=None, **kwargs):
     ------
     See `pyLDAvis.prepare` for **kwargs.
     """
-    opts = fp.merge(_extract_data(topic_model, corpus, dictionary, doc_topic_dist), kwargs)
+    dtype = kwargs.get('dtype', np.float64)
+    opts = fp.merge(_extract_data(topic_model, corpus, dictionary, doc_topic_dist, dtype,
+                                  kwargs.get('executor'), kwargs.get('n_jobs', -1)), kwargs)
     return pyLDAvis.prepare(**opts)
@@ -0,0 +1,135 @@
+/* Decompression of gzip data (RFC 1952 and 1951) in plain JavaScript, for the
+   browsers without DecompressionStream. Takes and returns a Uint8Array. */
+function LDAvis_gunzip(bytes) {
+    // bases and extra bits of the length and distance codes
+    var LENGTH_BASE = [3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 15, 17, 19, 23, 27, 31, 35, 43, 51, 59,
+                       67, 83, 99, 115, 131, 163, 195, 227, 258],
+        LENGTH_EXTRA = [0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4,
+                        5, 5, 5, 5, 0],
+        DIST_BASE = [1, 2, 3, 4, 5, 7, 9, 13, 17, 25, 33, 49, 65, 97, 129, 193, 257, 385, 513,
+                     769, 1025, 1537, 2049, 3073, 4097, 6145, 8193, 12289, 16385, 24577],
+        DIST_EXTRA = [0, 0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 6, 6, 7, 7, 8, 8, 9, 9, 10, 10,
+                      11, 11, 12, 12, 13, 13],
+        CODE_LENGTH_ORDER = [16, 17, 18, 0, 8, 7, 9, 6, 10, 5, 11, 4, 12, 3, 13, 2, 14, 1, 15];
+
+    // skip the header and its optional fields
+    var flags = bytes[3],
+        pos = 10;
+    if (flags & 4) pos += 2 + (bytes[pos] | bytes[pos + 1] << 8);
+    if (flags & 8) while (bytes[pos++]);
+    if (flags & 16) while (bytes[pos++]);
+    if (flags & 2) pos += 2;
+
+    // the size of the decompressed data is in the last 4 bytes
+    var n = bytes.length,
+        out = new Uint8Array((bytes[n - 4] | bytes[n - 3] << 8 | bytes[n - 2] << 16 |
+                              bytes[n - 1] << 24) >>> 0),
+        outPos = 0,
+        bitBuffer = 0,
+        bitCount = 0;
+
+    function bits(count) {
+        while (bitCount < count) {
+            bitBuffer |= bytes[pos++] << bitCount;
+            bitCount += 8;
+        }
+        var value = bitBuffer & ((1 << count) - 1);
+        bitBuffer >>>= count;
+        bitCount -= count;
+        return value;
+    }
+
+    // canonical Huffman code from the code length of each symbol
+    function huffman(lengths) {
+        var counts = new Uint16Array(16),
+            offsets = new Uint16Array(16),
+            symbols = new Uint16Array(lengths.length),
+            i;
+        for (i = 0; i < lengths.length; i++) counts[lengths[i]]++;
+        counts[0] = 0;
+        for (i = 1; i < 16; i++) offsets[i] = offsets[i - 1] + counts[i - 1];
+        for (i = 0; i < lengths.length; i++) {
+            if (lengths[i]) symbols[offsets[lengths[i]]++] = i;
+        }
+        return {counts: counts, symbols: symbols};
+    }
+
+    function decode(code) {
+        var value = 0, first = 0, index = 0;
+        for (var length = 1; length < 16; length++) {
+            value |= bits(1);
+            var count = code.counts[length];
+            if (value - count < first) return code.symbols[index + value - first];
+            index += count;
+            first = (first + count) << 1;
+            value <<= 1;
+        }
+        throw new Error("invalid gzip data");
+    }
+
+    var fixedLengths = new Uint8Array(288 + 30), i;
+    for (i = 0; i < 288; i++) fixedLengths[i] = i < 144 ? 8 : i < 256 ? 9 : i < 280 ? 7 : 8;
+    for (i = 288; i < 318; i++) fixedLengths[i] = 5;
+
+    var last;
+    do {
+        last = bits(1);
+        var type = bits(2);
+        if (type === 0) {
+            // stored block, from the next byte boundary
+            bitBuffer = bitCount = 0;
+            var length = bytes[pos] | bytes[pos + 1] << 8;
+            pos += 4;
+            out.set(bytes.subarray(pos, pos + length), outPos);
+            pos += length;
+            outPos += length;
+            continue;
+        }
+        var lengths;
+        if (type === 1) {
+            lengths = fixedLengths;
+        } else if (type === 2) {
+            var nLiterals = bits(5) + 257,
+                nDistances = bits(5) + 1,
+                nCodeLengths = bits(4) + 4,
+                codeLengths = new Uint8Array(19);
+            for (i = 0; i < nCodeLengths; i++) codeLengths[CODE_LENGTH_ORDER[i]] = bits(3);
+            var codeLengthCode = huffman(codeLengths);
+            lengths = new Uint8Array(288 + 30);
+            var all = new Uint8Array(nLiterals + nDistances);
+            for (i = 0; i < all.length;) {
+                var symbol = decode(codeLengthCode);
+                if (symbol < 16) {
+                    all[i++] = symbol;
+                } else {
+                    // 16 repeats the previous length, 17 and 18 repeat zeros
+                    var previous = symbol === 16 ? all[i - 1] : 0,
+                        repeat = symbol === 16 ? 3 + bits(2) :
+                                 symbol === 17 ? 3 + bits(3) : 11 + bits(7);
+                    while (repeat--) all[i++] = previous;
+                }
+            }
+            lengths.set(all.subarray(0, nLiterals));
+            lengths.set(all.subarray(nLiterals), 288);
+        } else {
+            throw new Error("invalid gzip data");
+        }
+        var literalCode = huffman(lengths.subarray(0, 288)),
+            distanceCode = huffman(lengths.subarray(288));
+        for (;;) {
+            var symbol = decode(literalCode);
+            if (symbol < 256) {
+                out[outPos++] = symbol;
+            } else if (symbol === 256) {
+                break;
+            } else {
+                symbol -= 257;
+                var length = LENGTH_BASE[symbol] + bits(LENGTH_EXTRA[symbol]),
+                    distance = decode(distanceCode);
+                var from = outPos - DIST_BASE[distance] - bits(DIST_EXTRA[distance]);
+                while (length--) out[outPos++] = out[from++];
+            }
+        }
+    } while (!last);
+    return out;
+}
@@ -105,7 +105,33 @@ var LDAvis = function(to_select, data_or_file_name, color1, color2) {
     }
 
 
+    // columns written by PreparedData.to_json(binary=True) are typed arrays in base64,
+    // with the strings given as indices into data['vocab']
+    function decode_columns(data) {
+        var types = {float32: Float32Array, float64: Float64Array, int32: Int32Array};
+        ['mdsDat', 'tinfo', 'token.table'].forEach(function(frame) {
+            for (var key in data[frame]) {
+                var column = data[frame][key];
+                if (column.data === undefined) continue;
+                var bytes = atob(column.data),
+                    buffer = new Uint8Array(bytes.length);
+                for (var i = 0; i < bytes.length; i++) {
+                    buffer[i] = bytes.charCodeAt(i);
+                }
+                var values = new types[column.dtype](buffer.buffer);
+                if (column.vocab) {
+                    values = Array.prototype.map.call(values, function(j) {
+                        return data['vocab'][j];
+                    });
+                }
+                data[frame][key] = values;
+            }
+        });
+    }
+
     function visualize(data) {
+        decode_columns(data);
+
         // set the number of topics to global variable K:
         K = data['mdsDat'].x.length;
 
@@ -1325,6 +1351,11 @@ var LDAvis = function(to_select, data_or_file_name, color1, color2) {
 
     if (typeof data_or_file_name === 'string')
         d3.json(data_or_file_name, function(error, data) {visualize(data);});
+    else if (typeof data_or_file_name.then === 'function')
+        // a promise of the data, e.g. of compressed data being decompressed
+        data_or_file_name.then(visualize, function(error) {
+            d3.select(to_select).text("LDAvis could not load the data: " + error.message);
+        });
     else
         visualize(data_or_file_name);
 };
@@ -6,6 +6,7 @@ Helper functions to visualize sklearn's LatentDirichletAllocation models
 
 import funcy as fp
 import pyLDAvis
+import pyLDAvis._prepare
 import numpy as np
 
 
@@ -35,19 +36,24 @@ def _row_norm(dists):
     return dists / dists.sum(axis=1)[:, None]
 
 
-def _get_doc_topic_dists(lda_model, dtm):
-    return _row_norm(lda_model.transform(dtm))
+def _get_doc_topic_dists(lda_model, dtm, executor=None, n_jobs=-1):
+    if executor is None:
+        return _row_norm(lda_model.transform(dtm))
+    # transform the documents in one chunk per worker of the executor
+    chunks = [dtm[start:stop]
+              for start, stop in pyLDAvis._prepare._chunk_bounds(dtm.shape[0], n_jobs)]
+    return _row_norm(np.vstack(list(executor.map(lda_model.transform, chunks))))
 
 
 def _get_topic_term_dists(lda_model):
     return _row_norm(lda_model.components_)
 
 
-def _extract_data(lda_model, dtm, vectorizer):
+def _extract_data(lda_model, dtm, vectorizer, dtype=np.float64, executor=None, n_jobs=-1):
     vocab = _get_vocab(vectorizer)
     doc_lengths = _get_doc_lengths(dtm)
     term_freqs = _get_term_freqs(dtm)
-    topic_term_dists = _get_topic_term_dists(lda_model)
+    topic_term_dists = _get_topic_term_dists(lda_model).astype(dtype, copy=False)
     err_msg = ('Topic-term distributions and document-term matrix'
                'have different number of columns, {} != {}.')
 
@@ -60,12 +66,12 @@ def _extract_data(lda_model, dtm, vectorizer):
 
     # column dimensions of document-term matrix and topic-term distributions
     # must match first before transforming to document-topic distributions
-    doc_topic_dists = _get_doc_topic_dists(lda_model, dtm)
+    doc_topic_dists = _get_doc_topic_dists(lda_model, dtm, executor, n_jobs)
     return {'vocab': vocab,
             'doc_lengths': doc_lengths.tolist(),
             'term_frequency': term_freqs.tolist(),
             'doc_topic_dists': doc_topic_dists.tolist(),
-            'topic_term_dists': topic_term_dists.tolist()}
+            'topic_term_dists': topic_term_dists}
 
 
 def prepare(lda_model, dtm, vectorizer, **kwargs):
@@ -83,6 +89,8 @@ def prepare(lda_model, dtm, vectorizer, **kwargs):
         vectorizer used to convert raw documents to document-term matrix (`dtm`)
 
     **kwargs: Keyword argument to be passed to pyLDAvis.prepare()
+        `dtype` is also used for the topic-term distributions taken from the model,
+        and `executor` to transform the documents in `n_jobs` chunks.
 
 
     Returns
@@ -100,5 +108,7 @@ def prepare(lda_model, dtm, vectorizer, **kwargs):
     ------
     See `pyLDAvis.prepare` for **kwargs.
     """
-    opts = fp.merge(_extract_data(lda_model, dtm, vectorizer), kwargs)
+    dtype = kwargs.get('dtype', np.float64)
+    opts = fp.merge(_extract_data(lda_model, dtm, vectorizer, dtype, kwargs.get('executor'),
+                                  kwargs.get('n_jobs', -1)), kwargs)
     return pyLDAvis.prepare(**opts)
@@ -1,11 +1,21 @@
 #! /usr/bin/venv python3
 
+import base64
+import gzip
+import io
+import json
 import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from gensim.models import LdaModel, HdpModel
 from gensim.corpora.dictionary import Dictionary
+import pytest
 
 import pyLDAvis
+import pyLDAvis.urls
 import pyLDAvis.gensim_models as gensim_models
 
 
@@ -54,6 +64,105 @@ def test_hdp():
     os.remove('index_hdp.html')
 
 
+def test_lda_with_executor():
+    """Infers the documents and prepares the data on a thread pool."""
+    corpus, dictionary = get_corpus_dictionary()
+    lda = LdaModel(corpus=corpus, num_topics=2)
+
+    with ThreadPoolExecutor(2) as executor:
+        data = gensim_models.prepare(lda, corpus, dictionary, executor=executor, n_jobs=2)
+        assert len(data.topic_coordinates) == 2
+        # more workers than documents
+        data = gensim_models.prepare(lda, corpus, dictionary, executor=executor, n_jobs=16)
+        assert len(data.topic_coordinates) == 2
+
+
+def test_binary_html():
+    """Embeds the data as typed arrays, along with the LDAvis library decoding them
+    unless another one is given."""
+    corpus, dictionary = get_corpus_dictionary()
+    lda = LdaModel(corpus=corpus, num_topics=2)
+    data = gensim_models.prepare(lda, corpus, dictionary)
+
+    html = pyLDAvis.prepared_data_to_html(data, ldavis_url='ldavis.js', binary=True)
+    assert data.to_json(binary=True) in html
+    assert '"ldavis.js"' in html
+    html = pyLDAvis.prepared_data_to_html(data, binary=True)
+    library = re.search(r'"data:text/javascript;base64,([A-Za-z0-9+/=]+)"', html)
+    with open(pyLDAvis.urls.LDAVIS_LOCAL, 'rb') as f:
+        assert base64.b64decode(library.group(1)) == f.read()
+
+
+def test_compressed_html():
+    """Saves the html outputs with the data gzip-compressed, along with the JavaScript
+    decompressing it where the browser cannot and the LDAvis library reading it unless
+    another one is given."""
+    corpus, dictionary = get_corpus_dictionary()
+    lda = LdaModel(corpus=corpus, num_topics=2)
+    data = gensim_models.prepare(lda, corpus, dictionary)
+
+    html = io.StringIO()
+    pyLDAvis.save_html(data, html, ldavis_url='ldavis.js', compress='gzip')
+    encoded = re.search(r'\}\("([A-Za-z0-9+/=]+)"\)\)', html.getvalue())
+    assert json.loads(gzip.decompress(base64.b64decode(encoded.group(1)))) == \
+        json.loads(data.to_json())
+    assert 'function LDAvis_gunzip(bytes)' in html.getvalue()
+    assert '"ldavis.js"' in html.getvalue()
+    html = pyLDAvis.prepared_data_to_html(data, compress='gzip')
+    library = re.search(r'"data:text/javascript;base64,([A-Za-z0-9+/=]+)"', html)
+    with open(pyLDAvis.urls.LDAVIS_LOCAL, 'rb') as f:
+        assert base64.b64decode(library.group(1)) == f.read()
+
+
+def _non_finite_data():
+    corpus, dictionary = get_corpus_dictionary()
+    lda = LdaModel(corpus=corpus, num_topics=2)
+    data = gensim_models.prepare(lda, corpus, dictionary)
+    topic_info = data.topic_info.copy()
+    topic_info.iloc[0, topic_info.columns.get_loc('loglift')] = float('nan')
+    topic_info.iloc[1, topic_info.columns.get_loc('logprob')] = float('-inf')
+    return data._replace(topic_info=topic_info)
+
+
+def test_compressed_html_non_finite():
+    """The compressed data keeps the NaN and -Infinity values, which JSON.parse
+    rejects."""
+    data = _non_finite_data()
+    html = pyLDAvis.prepared_data_to_html(data, ldavis_url='ldavis.js', compress='gzip')
+    encoded = re.search(r'\}\("([A-Za-z0-9+/=]+)"\)\)', html)
+    text = gzip.decompress(base64.b64decode(encoded.group(1))).decode()
+
+    def reject(constant):
+        raise ValueError(constant)
+
+    with pytest.raises(ValueError, match='NaN|-Infinity'):
+        json.loads(text, parse_constant=reject)
+    assert 'JSON.parse' not in html and '.json()' not in html
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node')
+@pytest.mark.parametrize('decompression_stream', [True, False])
+def test_compressed_html_in_node(tmp_path, decompression_stream):
+    """The expression embedded in the page evaluates to the data, NaN and -Infinity
+    included, with and without DecompressionStream."""
+    data = _non_finite_data()
+    html = pyLDAvis.prepared_data_to_html(data, ldavis_url='ldavis.js', compress='gzip')
+    start = html.index('(function(data){')
+    end = re.search(r'\}\("[A-Za-z0-9+/=]+"\)\)', html).end()
+    script = tmp_path / 'data.js'
+    script.write_text(
+        ('' if decompression_stream else 'delete globalThis.DecompressionStream;\n') +
+        'var data = ' + html[start:end] + ';\n'
+        'data.then(function(d){ console.log(JSON.stringify(d, function(key, value){\n'
+        '    return typeof(value) === "number" && !isFinite(value) ? String(value) : value;\n'
+        '})); });\n')
+    output = subprocess.run(['node', str(script)], capture_output=True, text=True,
+                            check=True).stdout
+    expected = json.loads(data.to_json(), parse_constant=str)
+    assert json.loads(output) == expected
+    assert json.loads(output)['tinfo']['loglift'][0] == 'NaN'
+
+
 def test_sorted_terms():
     """This tests that we can get the terms of a given topic using lambda
     to calculate the relevance ranking. A common workflow is that once we
@@ -77,4 +186,5 @@ def test_sorted_terms():
 if __name__ == "__main__":
     test_lda()
     test_hdp()
+    test_lda_with_executor()
     test_sorted_terms()
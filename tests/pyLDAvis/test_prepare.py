@@ -1,14 +1,24 @@
 #! /usr/bin/venv python3
 
+import base64
 import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import os.path as path
 import funcy as fp
 from numpy.testing import assert_array_equal
 import numpy as np
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal
+from scipy.sparse import csr_matrix
+from scipy.spatial.distance import pdist
 
-from pyLDAvis import prepare
+from pyLDAvis import prepare, PreparedModel, TopicDistances
+from pyLDAvis import _prepare
+from pyLDAvis._prepare import (_find_relevance, _jensen_shannon, _jensen_shannon_pdist,
+                               _prune_terms, _relevance_schedule, _relevant_terms,
+                               _term_statistics, js_LMDS, js_PCoA, ValidationError)
+from pyLDAvis.utils import NumPyEncoder
 
 roundtrip = fp.compose(json.loads, lambda d: d.to_json(), prepare)
 
@@ -25,6 +35,17 @@ def load_dataset(name):
     return data_input, expected
 
 
+def random_model(n_topics, n_terms, n_docs=40, beta=0.1, **kwargs):
+    """The inputs of `prepare` for a random model with the given numbers of topics, terms
+    and documents, along with any other `kwargs`."""
+    rng = np.random.RandomState(0)
+    return dict(topic_term_dists=rng.dirichlet(np.full(n_terms, beta), size=n_topics),
+                doc_topic_dists=rng.dirichlet(np.full(n_topics, 0.5), size=n_docs),
+                doc_lengths=rng.randint(10, 100, size=n_docs),
+                vocab=['term%d' % i for i in range(n_terms)],
+                term_frequency=rng.randint(1, 50, size=n_terms), **kwargs)
+
+
 def remove_col_suffixes(df):
     df.columns = [w.split('_')[0] for w in df.columns]
     return df
@@ -86,3 +107,359 @@ def test_end_to_end_with_R_examples():
     most_likely_map.index.names = ['Topic_o', 'Topic_e']
     df = pd.DataFrame(most_likely_map).reset_index()
     assert_array_equal(df['Topic_o'].values, df['Topic_e'].values)
+
+
+def test_float32_matches_float64_with_R_examples():
+    data_input, _ = load_dataset('movie_reviews')
+    inputs = dict(topic_term_dists=data_input['phi'],
+                  doc_topic_dists=data_input['theta'],
+                  doc_lengths=data_input['doc.length'],
+                  vocab=data_input['vocab'],
+                  term_frequency=data_input['term.frequency'], R=30, lambda_step=0.01)
+    expected = prepare(**inputs)
+    output = prepare(dtype=np.float32, **inputs)
+
+    assert_array_equal(np.array(expected.topic_order), np.array(output.topic_order))
+
+    def top_terms(prepared):
+        return prepared.topic_info.groupby('Category')['Term'].apply(set).to_dict()
+
+    assert top_terms(expected) == top_terms(output)
+
+
+def test_find_relevance_matches_nlargest():
+    rng = np.random.RandomState(0)
+    # integer valued logs so that plenty of terms are tied at the top-R cutoff
+    log_ttd = rng.randint(-8, 0, size=(5, 60)).astype(float)
+    log_lift = rng.randint(-3, 3, size=(5, 60)).astype(float)
+    lambda_seq = np.arange(0, 1.1, 0.1)
+
+    top_terms = _find_relevance(log_ttd, log_lift, 10, lambda_seq)
+
+    assert top_terms.shape == (len(lambda_seq), 5, 10)
+    for i, lambda_ in enumerate(lambda_seq):
+        relevance = pd.DataFrame(lambda_ * log_ttd + (1 - lambda_) * log_lift)
+        expected = relevance.T.apply(lambda topic: topic.nlargest(10).index)
+        assert_array_equal(expected.values.T, top_terms[i])
+
+
+def test_exact_lambda_step_covers_grid():
+    inputs = random_model(6, 300, n_docs=50, R=10, n_jobs=1)
+
+    def topic_terms(prepared):
+        tinfo = prepared.topic_info
+        return set(zip(tinfo.Category, tinfo.Term))
+
+    exact = prepare(lambda_step='exact', **inputs)
+    assert topic_terms(prepare(lambda_step=0.01, **inputs)) <= topic_terms(exact)
+    assert topic_terms(prepare(lambda_step=0.001, **inputs)) <= topic_terms(exact)
+    assert json.loads(exact.to_json())['lambda.step'] == 0.01
+
+
+def test_jensen_shannon_pdist_matches_pdist():
+    rng = np.random.RandomState(0)
+    distributions = rng.dirichlet(np.full(500, 0.1), size=12)
+    distributions[3] = distributions[7]
+    np.testing.assert_allclose(_jensen_shannon_pdist(distributions),
+                               pdist(distributions, metric=_jensen_shannon), atol=1e-12)
+
+
+def test_prepare_with_topic_distances():
+    inputs = random_model(8, 200, n_jobs=1)
+    topic_term_dists = inputs['topic_term_dists']
+    distances = TopicDistances.from_distributions(topic_term_dists)
+    assert distances.n_topics == 8
+
+    for mds in ('pcoa', 'mmds'):
+        expected = prepare(mds=mds, **inputs).topic_coordinates
+        actual = prepare(mds=mds, topic_distances=distances, **inputs).topic_coordinates
+        assert_frame_equal(expected, actual)
+
+    distances = TopicDistances.from_distributions(topic_term_dists, dtype=np.float32)
+    assert distances.condensed.dtype == np.float32
+    actual = prepare(topic_distances=distances, **inputs).topic_coordinates
+    expected = prepare(**inputs).topic_coordinates
+    assert_frame_equal(expected.abs(), actual.abs(), check_exact=False, atol=1e-5)
+
+
+def test_landmark_mds():
+    rng = np.random.RandomState(0)
+    distributions = rng.dirichlet(np.full(200, 0.1), size=30)
+    # with every topic as a landmark, landmark MDS is classical MDS
+    np.testing.assert_allclose(np.abs(js_LMDS(distributions, n_landmarks=30)),
+                               np.abs(js_PCoA(distributions)), atol=1e-10)
+    # triangulation is exact for euclidean distances
+    points = rng.normal(size=(30, 2))
+    distances = TopicDistances(pdist(points))
+    np.testing.assert_allclose(pdist(js_LMDS(distances, n_landmarks=5)), distances.condensed)
+
+
+def test_sparse_topic_term_dists():
+    inputs = random_model(6, 400, R=10, n_jobs=1)
+    topic_term_dists = inputs.pop('topic_term_dists')
+    topic_term_dists[topic_term_dists < 1e-3] = 0
+    topic_term_dists /= topic_term_dists.sum(axis=1)[:, None]
+
+    for lambda_step in (0.01, 'exact'):
+        dense = prepare(topic_term_dists, lambda_step=lambda_step, **inputs)
+        sparse = prepare(csr_matrix(topic_term_dists), lambda_step=lambda_step, **inputs)
+        assert_frame_equal(dense.topic_info, sparse.topic_info)
+        assert_frame_equal(dense.token_table, sparse.token_table)
+        assert_frame_equal(dense.topic_coordinates.abs(), sparse.topic_coordinates.abs())
+
+    # a term that no topic uses leaves the topics fewer than R candidate terms
+    inputs = random_model(4, 25, beta=0.5, R=30, n_jobs=1)
+    topic_term_dists = inputs.pop('topic_term_dists')
+    topic_term_dists[:, 3] = 0
+    topic_term_dists /= topic_term_dists.sum(axis=1)[:, None]
+    for lambda_step in (0.01, 'exact'):
+        dense = prepare(topic_term_dists, lambda_step=lambda_step, **inputs)
+        sparse = prepare(csr_matrix(topic_term_dists), lambda_step=lambda_step, **inputs)
+        # the dense grid search also lists the unused term, without a lift
+        assert_frame_equal(dense.topic_info.dropna(subset=['loglift']), sparse.topic_info)
+        assert_frame_equal(dense.token_table, sparse.token_table)
+
+
+def test_streaming_doc_topic_dists(tmpdir):
+    model = random_model(5, 200, n_docs=300, R=10, n_jobs=1)
+    doc_topic_dists = model.pop('doc_topic_dists')
+    doc_lengths = model.pop('doc_lengths')
+    expected = prepare(doc_topic_dists=doc_topic_dists, doc_lengths=doc_lengths, **model)
+
+    filename = str(tmpdir.join('doc_topic_dists.npy'))
+    np.save(filename, doc_topic_dists)
+    batches = ((doc_topic_dists[i:i + 64], doc_lengths[i:i + 64]) for i in range(0, 300, 64))
+    for data in (dict(doc_topic_dists=np.load(filename, mmap_mode='r'), doc_lengths=doc_lengths),
+                 dict(doc_topic_dists=batches, doc_lengths=None),
+                 dict(doc_topic_dists=None, doc_lengths=None,
+                      topic_freq=doc_lengths.dot(doc_topic_dists))):
+        prepared = prepare(**data, **model)
+        assert_frame_equal(expected.topic_info, prepared.topic_info)
+        assert_frame_equal(expected.token_table, prepared.token_table)
+
+    with pytest.raises(ValidationError, match='batches'):
+        prepare(doc_topic_dists=doc_topic_dists, doc_lengths=None, **model)
+
+
+def test_validate_modes():
+    inputs = random_model(4, 50, n_docs=30, R=10, n_jobs=1)
+    inputs['doc_topic_dists'][3] *= 0.5
+
+    for validate in ('full', 'sample'):
+        with pytest.raises(ValidationError, match='doc_topic_dists sum to 1'):
+            prepare(validate=validate, **inputs)
+    prepare(validate_tol=0.6, **inputs)
+    prepare(validate='none', **inputs)
+
+
+def test_relevance_schedule(monkeypatch):
+    assert _relevance_schedule(20, 1000, 101, 8) == (1, [(slice(0, 20), slice(0, 101))])
+
+    monkeypatch.setattr(_prepare, '_PARALLEL_MIN_VALUES', 0)
+    for n_topics, n_jobs in ((20, 8), (3, 8), (1, 2)):
+        n_workers, tasks = _relevance_schedule(n_topics, 1000, 101, n_jobs)
+        assert n_workers == min(n_jobs, len(tasks))
+        covered = np.zeros((n_topics, 101), dtype=int)
+        for topics, lambdas in tasks:
+            covered[topics, lambdas] += 1
+        assert (covered == 1).all()
+
+    inputs = random_model(5, 300, R=10)
+    assert_frame_equal(prepare(n_jobs=1, **inputs).topic_info,
+                       prepare(n_jobs=2, **inputs).topic_info)
+
+
+def test_chunk_bounds():
+    assert _prepare._chunk_bounds(10, 3) == [(0, 3), (3, 6), (6, 10)]
+    assert _prepare._chunk_bounds(4, 8) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+    assert _prepare._chunk_bounds(0, 8) == [(0, 0)]
+
+
+def test_prepare_with_executor(monkeypatch):
+    monkeypatch.setattr(_prepare, '_PARALLEL_MIN_VALUES', 0)
+    inputs = random_model(5, 300, R=10)
+    expected = prepare(n_jobs=1, **inputs)
+
+    for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+        with executor_class(2) as executor:
+            prepared = prepare(executor=executor, n_jobs=2, **inputs)
+        assert_frame_equal(expected.topic_info, prepared.topic_info)
+        assert_frame_equal(expected.topic_coordinates, prepared.topic_coordinates)
+
+
+def test_prepare_cache(tmpdir):
+    inputs = random_model(5, 300, R=10, n_jobs=1)
+    cache_dir = str(tmpdir)
+    expected = prepare(cache_dir=cache_dir, **inputs)
+    assert len(tmpdir.listdir()) == 1
+    cached = prepare(cache_dir=cache_dir, **inputs)
+    for name in ('topic_coordinates', 'topic_info', 'token_table'):
+        assert_frame_equal(getattr(expected, name), getattr(cached, name))
+    assert expected.to_json() == cached.to_json()
+
+    prepare(cache_dir=cache_dir, lambda_step=0.1, **inputs)
+    assert len(tmpdir.listdir()) == 2
+    # a new entry evicts the least recently used ones beyond cache_size
+    prepare(cache_dir=cache_dir, cache_size=1, sort_topics=False, **inputs)
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_prepared_model():
+    model_inputs = random_model(6, 300, n_jobs=1)
+    model = PreparedModel(**model_inputs)
+
+    for params in (dict(R=10), dict(R=10, sort_topics=False, start_index=0),
+                   dict(R=10, mds='mmds'), dict(R=5, lambda_step='exact')):
+        expected = prepare(**model_inputs, **params)
+        prepared = model.prepare(**params)
+        for name in ('topic_coordinates', 'topic_info', 'token_table'):
+            assert_frame_equal(getattr(expected, name), getattr(prepared, name))
+        assert expected.to_json() == prepared.to_json()
+
+
+def test_term_statistics_blocks(monkeypatch):
+    rng = np.random.RandomState(0)
+    topic_term_dists = rng.dirichlet(np.full(500, 0.1), size=6)
+    topic_term_dists[:, :3] = 0
+    topic_proportion = rng.dirichlet(np.ones(6))
+    term_proportion = topic_term_dists.T.dot(topic_proportion)
+    expected = _term_statistics(topic_term_dists, topic_proportion, term_proportion)
+
+    # blocks of 11 terms, the last one partial
+    monkeypatch.setattr(_prepare, '_TERM_BLOCK_SIZE', 66)
+    blocked = _term_statistics(topic_term_dists, topic_proportion, term_proportion)
+    for a, b in zip(expected, blocked):
+        assert_array_equal(a, b)
+    with np.errstate(divide='ignore'):
+        assert_array_equal(blocked[0], np.log(topic_term_dists))
+    assert np.isfinite(blocked[2]).all()
+
+
+def test_pruning_keeps_relevant_terms(monkeypatch):
+    rng = np.random.RandomState(0)
+    topic_term_dists = rng.dirichlet(np.full(2000, 0.05), size=8)
+    term_proportion = topic_term_dists.mean(axis=0)
+    with np.errstate(divide='ignore'):
+        log_ttd = np.log(topic_term_dists)
+        log_lift = np.log(topic_term_dists / term_proportion)
+
+    # a step of 0.03 also evaluates lambda = 1.02
+    kept = _prune_terms(log_ttd, log_lift, 10, 1.02)
+    assert 0 < len(kept) < 2000
+    pruned = _relevant_terms(topic_term_dists, log_ttd, log_lift, term_proportion, 0.03, 10)
+    monkeypatch.setattr(_prepare, '_prune_terms', lambda log_ttd, *args: np.arange(2000))
+    full = _relevant_terms(topic_term_dists, log_ttd, log_lift, term_proportion, 0.03, 10)
+    for a, b in zip(full, pruned):
+        assert_array_equal(a, b)
+
+
+def test_token_table(monkeypatch):
+    rng = np.random.RandomState(0)
+    topic_term_dists = rng.dirichlet(np.full(40, 0.3), size=5)
+    topic_freq = rng.randint(50, 500, size=5).astype(float)
+    term_frequency = topic_term_dists.T.dot(topic_freq)
+    # some terms share their string
+    vocab = np.array(['w%d' % (i % 25) for i in range(40)], dtype=object)
+    topic_info = pd.DataFrame(index=rng.choice(40, size=30))
+    topic_order = rng.permutation(5)
+
+    # small blocks of terms
+    monkeypatch.setattr(_prepare, '_TERM_BLOCK_SIZE', 20)
+    token_table = _prepare._token_table(topic_info, topic_term_dists, topic_order, topic_freq,
+                                        vocab, term_frequency, start_index=0)
+
+    term_ix = np.sort(topic_info.index.unique())
+    freq = pd.DataFrame(topic_term_dists[np.ix_(topic_order, term_ix)]
+                        * topic_freq[topic_order][:, None],
+                        index=pd.Index(range(5), name='Topic'),
+                        columns=pd.Index(term_ix, name='term'))
+    expected = pd.DataFrame({'Freq': freq.unstack()})\
+        .reset_index().set_index('term').query('Freq >= 0.5')
+    expected['Freq'] = expected['Freq'].round()
+    expected['Term'] = vocab[expected.index.values]
+    expected['Freq'] = expected.Freq / term_frequency[expected.index.values]
+    assert_frame_equal(token_table, expected.sort_values(by=['Term', 'Topic']))
+
+
+def test_term_block_size():
+    inputs = random_model(6, 400, beta=0.05, R=10, n_jobs=1)
+    topic_term_dists = inputs.pop('topic_term_dists')
+    topic_term_dists[:, :20] = 0
+    topic_term_dists /= topic_term_dists.sum(axis=1)[:, None]
+
+    for lambda_step in (0.01, 0.2, 'exact'):
+        expected = prepare(topic_term_dists, lambda_step=lambda_step, **inputs)
+        for term_block_size in (1, 64, 1000):
+            blocked = prepare(topic_term_dists, lambda_step=lambda_step,
+                              term_block_size=term_block_size, **inputs)
+            assert_frame_equal(expected.topic_info, blocked.topic_info)
+            assert_frame_equal(expected.token_table, blocked.token_table)
+            assert_frame_equal(expected.topic_coordinates.abs(), blocked.topic_coordinates.abs())
+
+    with pytest.raises(ValueError):
+        prepare(topic_term_dists, term_block_size=0, **inputs)
+
+
+def test_max_memory(monkeypatch):
+    inputs = random_model(6, 20000, beta=0.05, R=10, n_jobs=1)
+    topic_term_dists = inputs.pop('topic_term_dists')
+    # small buffers, so that the estimates scale with the size of the model
+    for name in ('_RELEVANCE_BLOCK_SIZE', '_JS_BLOCK_SIZE', '_TERM_BLOCK_SIZE'):
+        monkeypatch.setattr(_prepare, name, 1024)
+    held, stages = _prepare._memory_estimate(topic_term_dists.shape, 40, np.float64,
+                                             input_copy=False)
+    max_memory = held + max(stages.values()) - 1
+
+    dtype, term_block_size, n_jobs = _prepare._memory_plan(
+        max_memory, topic_term_dists, 40, np.dtype(np.float64), None, 1, None)
+    assert dtype == np.float64 and term_block_size is not None
+    expected = prepare(topic_term_dists, **inputs)
+    prepared = prepare(topic_term_dists, max_memory=max_memory, **inputs)
+    assert_frame_equal(expected.topic_info, prepared.topic_info)
+    assert_frame_equal(expected.token_table, prepared.token_table)
+
+    with pytest.raises(MemoryError, match='max_memory'):
+        prepare(topic_term_dists, max_memory=2 ** 10, **inputs)
+
+    # the landmark layout never holds the distances between all the topics
+    inputs = random_model(2000, 50, n_docs=10, R=10, n_jobs=1)
+    held, stages = _prepare._memory_estimate((2000, 50), 10, np.float64, input_copy=False,
+                                             mds=js_LMDS)
+    max_memory = held + max(stages.values())
+    prepare(mds='landmark', max_memory=max_memory, **inputs)
+    with pytest.raises(MemoryError, match='topic layout'):
+        prepare(max_memory=max_memory, **inputs)
+
+
+def test_to_json_matches_to_dict():
+    prepared = prepare(**random_model(6, 300, R=10, lambda_step='exact', n_jobs=1))
+    token_table = prepared.token_table.head(4).copy()
+    token_table['Freq'] = [np.nan, np.inf, -0.0, 1e-320]
+    token_table['Term'] = ['caf\u00e9', 'a"b', '\\', '\u2603']
+    # repeated values, formatted once each
+    repeated = prepared.token_table.head(18).copy()
+    repeated['Freq'] = [np.nan, np.inf, -np.inf, -0.0, 0.0, 1e-320] * 3
+    topic_coordinates = prepared.topic_coordinates.assign(cluster=True)
+    topic_info = prepared.topic_info.astype({'Freq': np.float32, 'Total': np.int32})
+    for data in (prepared, prepared._replace(token_table=token_table, topic_info=topic_info),
+                 prepared._replace(token_table=repeated, topic_coordinates=topic_coordinates)):
+        assert data.to_json() == json.dumps(data.to_dict(), cls=NumPyEncoder)
+
+
+def test_binary_json():
+    prepared = prepare(**random_model(6, 300, R=10, n_jobs=1))
+    expected = prepared.to_dict()
+    data = json.loads(prepared.to_json(binary=True))
+
+    for frame in ('mdsDat', 'tinfo', 'token.table'):
+        assert list(data[frame]) == list(expected[frame])
+        for name, column in data[frame].items():
+            values = np.frombuffer(base64.b64decode(column['data']),
+                                   dtype=np.dtype(column['dtype']).newbyteorder('<'))
+            if column.get('vocab'):
+                assert [data['vocab'][i] for i in values] == expected[frame][name]
+            else:
+                np.testing.assert_allclose(values, expected[frame][name], rtol=1e-6)
+    assert len(data['vocab']) == len(set(data['vocab']))
+    for key in ('R', 'lambda.step', 'plot.opts', 'topic.order'):
+        assert data[key] == expected[key]